@@ -1,19 +1,319 @@
 # ai.py - OpenAI integration for AI reasoning, Q&A, and summarization
 
-import openai
-import requests
+import asyncio
+import contextlib
+import hashlib
 import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
-from utils import log_message, retry_operation, speak
+from functools import cache, lru_cache
+from itertools import islice
+
+import aiohttp
+import httpx
+import numpy as np
+import openai
+import tiktoken
+from openai import AsyncOpenAI
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random, wait_random_exponential
+from utils import log_message
 from config import *
 
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # Optional speedup, fall back to the standard library
+    orjson = None
+
+# Matches the "1." / "2)" prefix of each item in a numbered list response
+NUMBERED_ITEM_PATTERN = re.compile(r'^\s*(\d+)[.)]\s*', re.MULTILINE)
+
+# Captures the text of each "1. idea" / "2) idea" / "- idea" / "• idea" line
+IDEA_LINE_PATTERN = re.compile(r'^[ \t]*(?:\d+[.)]|[-•*])[ \t]*(.+?)[ \t]*$', re.MULTILINE)
+
+def dumps_json(obj, sort_keys=False):
+    """Serialize obj to JSON bytes"""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else None)
+    return json.dumps(obj, sort_keys=sort_keys).encode()
+
+def loads_json(data):
+    """Parse JSON text or bytes"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+# Errors worth retrying; anything else (bad request, auth) fails immediately
+TRANSIENT_OPENAI_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError
+)
+
+# Full jitter keeps concurrent callers from retrying in lockstep after an outage
+retry_transient = retry(
+    retry=retry_if_exception_type(TRANSIENT_OPENAI_ERRORS),
+    wait=wait_random_exponential(multiplier=1, max=AI_RETRY_MAX_WAIT) + wait_random(0, 1),
+    stop=stop_after_attempt(AI_RETRY_ATTEMPTS),
+    reraise=True
+)
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    """Get the tiktoken encoding for the configured model"""
+    try:
+        return tiktoken.encoding_for_model(OPENAI_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_message_tokens(messages):
+    """Estimate the prompt tokens used by a list of chat messages"""
+    encoding = get_encoding()
+    return sum(len(encoding.encode(message["content"])) + 4 for message in messages) + 2
+
+# Output tokens per input token when translating into a language;
+# anything not listed gets a generous default
+TRANSLATION_EXPANSION = {"chinese": 1.2, "japanese": 1.3, "spanish": 1.5, "german": 1.4}
+
+def translation_token_budget(text, target_language):
+    """Size max_tokens for translating text into target_language"""
+    input_tokens = len(get_encoding().encode(text))
+    return int(input_tokens * TRANSLATION_EXPANSION.get(target_language.lower(), 1.8)) + 32
+
+@contextlib.asynccontextmanager
+async def map_aiohttp_exceptions():
+    """Re-raise aiohttp errors as the httpx errors the OpenAI client handles"""
+    try:
+        yield
+    except asyncio.TimeoutError as e:
+        raise httpx.TimeoutException(str(e)) from e
+    except aiohttp.ClientPayloadError as e:
+        raise httpx.ReadError(str(e)) from e
+    except aiohttp.ClientConnectionError as e:
+        raise httpx.ConnectError(str(e)) from e
+    except aiohttp.ClientError as e:
+        raise httpx.NetworkError(str(e)) from e
+
+class AioResponseStream(httpx.AsyncByteStream):
+    """Expose an aiohttp response body as an httpx byte stream"""
+    CHUNK_SIZE = 16 * 1024
+    
+    def __init__(self, aiohttp_response):
+        self._response = aiohttp_response
+    
+    async def __aiter__(self):
+        async with map_aiohttp_exceptions():
+            async for chunk in self._response.content.iter_chunked(self.CHUNK_SIZE):
+                yield chunk
+    
+    async def aclose(self):
+        self._response.release()
+
+class AioTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that sends requests through a shared aiohttp session.
+    httpx's own connection pool serializes badly under many concurrent
+    small requests, aiohttp's connector does not.
+    """
+    def __init__(self, client_session):
+        self.client_session = client_session
+    
+    async def handle_async_request(self, request):
+        timeout = request.extensions.get("timeout", {})
+        
+        try:
+            data = request.content
+        except httpx.RequestNotRead:
+            data = request.stream
+            request.headers.pop("transfer-encoding", None)
+        
+        async with map_aiohttp_exceptions():
+            response = await self.client_session.request(
+                method=request.method,
+                url=str(request.url),
+                headers=request.headers,
+                data=data,
+                allow_redirects=False,
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=timeout.get("connect"),
+                    sock_read=timeout.get("read"),
+                    connect=timeout.get("pool")
+                )
+            )
+        
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.raw_headers,
+            stream=AioResponseStream(response),
+            request=request
+        )
+    
+    async def aclose(self):
+        await self.client_session.close()
+
+class TokenBucket:
+    """Paces requests to stay under per-minute request and token limits"""
+    def __init__(self, requests_per_minute=AI_REQUESTS_PER_MINUTE, tokens_per_minute=AI_TOKENS_PER_MINUTE):
+        self.capacity_rpm = requests_per_minute
+        self.capacity_tpm = tokens_per_minute
+        self.tokens_r = float(requests_per_minute)
+        self.tokens_t = float(tokens_per_minute)
+        self.last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.tokens_r = min(self.capacity_rpm, self.tokens_r + elapsed * self.capacity_rpm / 60)
+        self.tokens_t = min(self.capacity_tpm, self.tokens_t + elapsed * self.capacity_tpm / 60)
+        self.last_refill = now
+    
+    async def acquire(self, tokens):
+        """Wait until one request and the given number of tokens fit in the budget"""
+        tokens = min(tokens, self.capacity_tpm)
+        
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens_r >= 1 and self.tokens_t >= tokens:
+                    self.tokens_r -= 1
+                    self.tokens_t -= tokens
+                    return
+                
+                wait_time = max(
+                    (1 - self.tokens_r) * 60 / self.capacity_rpm,
+                    (tokens - self.tokens_t) * 60 / self.capacity_tpm
+                )
+                await asyncio.sleep(wait_time)
+
+class LLMCache:
+    """LRU cache of chat completion results keyed by the exact request"""
+    def __init__(self, max_size=AI_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+    
+    def make_key(self, messages, temperature, max_tokens):
+        """Hash a request, or return None if its output is too random to reuse"""
+        if temperature > AI_CACHE_MAX_TEMPERATURE:
+            return None
+        
+        payload = dumps_json(
+            {"m": OPENAI_MODEL, "msgs": messages, "t": temperature, "mx": max_tokens},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload).hexdigest()
+    
+    def get(self, key):
+        """Return the cached response for key, or None on a miss"""
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+    
+    def put(self, key, value):
+        """Store a response, evicting the least recently used entry when full"""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop all cached responses"""
+        self._entries.clear()
+
+class SemanticCache:
+    """Reuse answers to near-identical prompts by embedding cosine similarity"""
+    def __init__(self, threshold=AI_SEMANTIC_CACHE_THRESHOLD, max_size=AI_SEMANTIC_CACHE_SIZE):
+        self.threshold = threshold
+        self.max_size = max_size
+        self._banks = {}  # namespace -> (unit vector matrix, answers)
+    
+    def lookup(self, namespace, vector):
+        """Return the answer whose prompt is most similar to vector, if close enough"""
+        bank = self._banks.get(namespace)
+        if bank is None:
+            return None
+        
+        matrix, answers = bank
+        similarities = matrix @ vector
+        best = int(similarities.argmax())
+        if similarities[best] >= self.threshold:
+            return answers[best]
+        return None
+    
+    def add(self, namespace, vector, answer):
+        """Remember an answer, dropping the oldest entry when the bank is full"""
+        matrix, answers = self._banks.get(namespace, (np.empty((0, vector.shape[0]), dtype=np.float32), []))
+        matrix = np.vstack([matrix, vector])
+        answers = answers + [answer]
+        
+        if len(answers) > self.max_size:
+            matrix = matrix[1:]
+            answers = answers[1:]
+        
+        self._banks[namespace] = (matrix, answers)
+    
+    def clear(self):
+        """Drop all cached answers"""
+        self._banks.clear()
+
 class AIHandler:
+    # System prompts are kept byte-identical across calls so OpenAI's
+    # prompt prefix caching can reuse them; only the {} fields vary
+    _ASSISTANT_SYS = "You are Sarah, a helpful AI assistant."
+    _SUMMARIZE_SYS = "Summarize the following text in approximately {n} words. Be concise and capture the key points."
+    _SENTIMENT_SYS = (
+        "Analyze the sentiment of the following text. Respond with a JSON object containing "
+        "'sentiment' (positive/negative/neutral), 'confidence' (0-1), and 'explanation'."
+    )
+    _IDEAS_SYS = "Generate {count} creative and practical ideas about the topic. Return them as a numbered list."
+    _TRANSLATE_SYS = "Translate the following text to {language}. Only provide the translation, no additional text."
+    _MATH_SYS = "Solve the math problem step by step. Show your work and explain each step clearly."
+    _COMPLEXITY_INSTRUCTIONS = {
+        "simple": "Explain this concept in simple terms that a child could understand. Use analogies and examples.",
+        "intermediate": "Provide a clear explanation suitable for a high school student. Include key details and examples.",
+        "advanced": "Give a comprehensive explanation with technical details, suitable for someone studying the subject."
+    }
+    _BATCH_TRANSLATE_SYS = (
+        "Translate each numbered line to {language}. "
+        "Return the translations as a numbered list with the same numbers, no additional text."
+    )
+    _BATCH_SUMMARIZE_SYS = (
+        "Summarize each numbered text in approximately {n} words. Be concise and capture the key points. "
+        "Return the summaries as a numbered list with the same numbers."
+    )
+    _BATCH_IDEAS_SYS = (
+        "Generate {count} creative and practical ideas for each numbered topic. "
+        "Return a numbered list with the same numbers, one line per topic, with its ideas separated by ' | '."
+    )
+    
     def __init__(self):
         self.client = None
-        self.conversation_history = []
+        self.aio_session = None
+        self.response_cache = LLMCache()
+        self.semantic_cache = SemanticCache()
+        self.rate_limiter = TokenBucket()
+        self._verified = False  # Set once a request has succeeded with the configured key
+        self._sem = asyncio.Semaphore(AI_MAX_CONCURRENT)  # Caps in-flight API calls
         self.max_history_length = 10  # Keep last 10 exchanges
+        self.conversation_history = deque(maxlen=self.max_history_length)
+        
+        # All OpenAI traffic runs on one background event loop so pooled
+        # connections are reused across calls from synchronous code
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+        
         self.initialize_openai()
     
+    def run_sync(self, coro):
+        """Run a coroutine on the AI event loop and block until it completes"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+    
     def initialize_openai(self):
         """Initialize OpenAI client"""
         if not OPENAI_API_KEY or OPENAI_API_KEY == "your-openai-api-key-here":
@@ -21,15 +321,14 @@ class AIHandler:
             return False
         
         try:
-            openai.api_key = OPENAI_API_KEY
-            self.client = openai
+            self.aio_session = self.run_sync(self._create_aio_session())
+            http_client = httpx.AsyncClient(transport=AioTransport(self.aio_session))
+            # Retries are handled by _call so they are paced by the rate limiter
+            self.client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client, max_retries=0)
             
-            # Test the connection
-            response = self.client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[{"role": "user", "content": "Hello"}],
-                max_tokens=10
-            )
+            # The key is verified by the first real request instead of a test call
+            if not OPENAI_API_KEY.startswith("sk-") or len(OPENAI_API_KEY) < 40:
+                log_message("OpenAI API key format looks invalid", "WARNING")
             
             log_message("OpenAI client initialized successfully")
             return True
@@ -38,7 +337,140 @@ class AIHandler:
             log_message(f"Failed to initialize OpenAI client: {e}", "ERROR")
             return False
     
-    def ask_question(self, question, context=None):
+    async def _create_aio_session(self):
+        """Create the shared aiohttp session on the AI event loop"""
+        # httpx decodes Content-Encoding itself, so aiohttp must pass bodies through
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=75),
+            auto_decompress=False
+        )
+    
+    async def aclose(self):
+        """Close the pooled HTTP connections used by the OpenAI client"""
+        if self.client:
+            await self.client.close()
+            self.client = None
+            self.aio_session = None
+    
+    def close(self):
+        """Close the OpenAI client and stop the AI event loop"""
+        if not self._loop.is_running():
+            return
+        
+        try:
+            self.run_sync(self.aclose())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+    
+    @retry_transient
+    async def _call(self, **kwargs):
+        """Send a rate-limited chat completion request, retrying transient errors"""
+        estimated_tokens = count_message_tokens(kwargs["messages"]) + kwargs.get("max_tokens", 0)
+        await self.rate_limiter.acquire(estimated_tokens)
+        async with self._sem:
+            response = await self.client.chat.completions.create(**kwargs)
+        
+        if not self._verified:
+            self._verified = True
+            log_message("OpenAI API key verified")
+        return response
+    
+    async def _chat_completion(self, messages, max_tokens, temperature):
+        """Run a chat completion, serving repeated deterministic requests from cache"""
+        cache_key = self.response_cache.make_key(messages, temperature, max_tokens)
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                log_message("AI response served from cache", "DEBUG")
+                return cached
+        
+        response = await self._call(
+            model=OPENAI_MODEL,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=OPENAI_TIMEOUT
+        )
+        content = response.choices[0].message.content.strip()
+        
+        if cache_key:
+            self.response_cache.put(cache_key, content)
+        return content
+    
+    async def _stream_completion(self, messages, max_tokens, temperature):
+        """Yield a chat completion piece by piece as it is generated"""
+        cache_key = self.response_cache.make_key(messages, temperature, max_tokens)
+        cached = self.response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            yield cached
+            return
+        
+        stream = await self._call(
+            model=OPENAI_MODEL,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=OPENAI_TIMEOUT,
+            stream=True
+        )
+        
+        parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+        
+        if cache_key:
+            self.response_cache.put(cache_key, "".join(parts).strip())
+    
+    def iterate_sync(self, agen):
+        """Iterate an async generator from synchronous code via the AI event loop"""
+        done = object()
+        
+        async def next_item():
+            try:
+                return await agen.__anext__()
+            except StopAsyncIteration:
+                return done
+        
+        try:
+            while True:
+                item = self.run_sync(next_item())
+                if item is done:
+                    return
+                yield item
+        finally:
+            self.run_sync(agen.aclose())
+    
+    @retry_transient
+    async def _embed(self, text):
+        """Get a unit-length embedding vector for text"""
+        async with self._sem:
+            response = await self.client.embeddings.create(model=AI_EMBEDDING_MODEL, input=text)
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+    
+    async def _semantic_completion(self, namespace, query, messages, max_tokens, temperature):
+        """Run a chat completion, reusing the answer to a semantically similar earlier query"""
+        try:
+            vector = await self._embed(query)
+        except Exception as e:
+            log_message(f"Embedding failed, skipping semantic cache: {e}", "WARNING")
+            return await self._chat_completion(messages, max_tokens, temperature)
+        
+        cached = self.semantic_cache.lookup(namespace, vector)
+        if cached is not None:
+            log_message("AI response served from semantic cache", "DEBUG")
+            return cached
+        
+        content = await self._chat_completion(messages, max_tokens, temperature)
+        self.semantic_cache.add(namespace, vector, content)
+        return content
+    
+    async def ask_question_async(self, question, context=None):
         """
         Ask a question to GPT and get an answer
         Args:
@@ -50,42 +482,38 @@ class AIHandler:
         if not self.client:
             return "AI service is not available. Please check your API key configuration."
         
-        def make_request():
-            messages = []
-            
-            # Add system message with context
-            system_message = f"You are Sarah, a helpful AI assistant. Current time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}."
-            if context:
-                system_message += f" Context: {context}"
-            
-            messages.append({"role": "system", "content": system_message})
+        async def make_request():
+            messages = [{"role": "system", "content": self._ASSISTANT_SYS}]
             
             # Add conversation history
-            for entry in self.conversation_history[-5:]:  # Last 5 exchanges
+            for entry in self.recent_history(5):  # Last 5 exchanges
                 messages.append({"role": "user", "content": entry["user"]})
                 messages.append({"role": "assistant", "content": entry["assistant"]})
             
+            # Per-call details go after the system prompt and history, which are
+            # the prefix shared with the next turn. Minute precision keeps
+            # retried or repeated questions byte-identical within a minute.
+            details = f"Current time: {datetime.now().strftime('%Y-%m-%d %H:%M')}."
+            if context:
+                details += f" Context: {context}"
+            messages.append({"role": "system", "content": details})
+            
             # Add current question
             messages.append({"role": "user", "content": question})
             
-            response = self.client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7,
-                timeout=OPENAI_TIMEOUT
-            )
-            
-            return response.choices[0].message.content.strip()
+            # Answers depend on the history and context, not just the question,
+            # so they are never served from the semantic cache
+            return await self._chat_completion(messages, max_tokens=500, temperature=0.7)
         
         try:
-            answer = retry_operation(make_request)
+            answer = await make_request()
             
             if answer:
                 # Add to conversation history
                 self.add_to_history(question, answer)
                 log_message(f"AI Question: {question}")
-                log_message(f"AI Answer: {answer}")
+                log_message(f"AI Answer: {len(answer)} chars sha1={hashlib.sha1(answer.encode()).hexdigest()[:8]}")
+                logger.debug("Full AI answer: %s", answer)
                 return answer
             else:
                 return "I'm sorry, I couldn't get an answer right now. Please try again later."
@@ -94,7 +522,7 @@ class AIHandler:
             log_message(f"Error in ask_question: {e}", "ERROR")
             return "I encountered an error while processing your question."
     
-    def summarize_text(self, text, max_length=100):
+    async def summarize_text_async(self, text, max_length=100):
         """
         Summarize the given text
         Args:
@@ -109,27 +537,20 @@ class AIHandler:
         if len(text.split()) < 20:
             return "The text is too short to summarize effectively."
         
-        def make_request():
+        async def make_request():
             messages = [
-                {
-                    "role": "system", 
-                    "content": f"Summarize the following text in approximately {max_length} words. Be concise and capture the key points."
-                },
+                {"role": "system", "content": self._SUMMARIZE_SYS.format(n=max_length)},
                 {"role": "user", "content": text}
             ]
             
-            response = self.client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=messages,
+            return await self._semantic_completion(
+                f"summarize:{max_length}", text, messages,
                 max_tokens=max_length * 2,  # Allow some buffer
-                temperature=0.3,
-                timeout=OPENAI_TIMEOUT
+                temperature=0.3
             )
-            
-            return response.choices[0].message.content.strip()
         
         try:
-            summary = retry_operation(make_request)
+            summary = await make_request()
             
             if summary:
                 log_message(f"Text summarized: {len(text)} chars -> {len(summary)} chars")
@@ -141,7 +562,7 @@ class AIHandler:
             log_message(f"Error in summarize_text: {e}", "ERROR")
             return "I encountered an error while summarizing."
     
-    def analyze_sentiment(self, text):
+    async def analyze_sentiment_async(self, text):
         """
         Analyze the sentiment of the given text
         Args:
@@ -152,32 +573,21 @@ class AIHandler:
         if not self.client:
             return {"sentiment": "unknown", "confidence": 0, "explanation": "AI service not available"}
         
-        def make_request():
+        async def make_request():
             messages = [
-                {
-                    "role": "system", 
-                    "content": "Analyze the sentiment of the following text. Respond with a JSON object containing 'sentiment' (positive/negative/neutral), 'confidence' (0-1), and 'explanation'."
-                },
+                {"role": "system", "content": self._SENTIMENT_SYS},
                 {"role": "user", "content": text}
             ]
             
-            response = self.client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=messages,
-                max_tokens=200,
-                temperature=0.1,
-                timeout=OPENAI_TIMEOUT
-            )
-            
-            return response.choices[0].message.content.strip()
+            return await self._chat_completion(messages, max_tokens=200, temperature=0.1)
         
         try:
-            result = retry_operation(make_request)
+            result = await make_request()
             
             if result:
                 # Try to parse JSON response
                 try:
-                    sentiment_data = json.loads(result)
+                    sentiment_data = loads_json(result)
                     return sentiment_data
                 except json.JSONDecodeError:
                     # Fallback parsing if JSON fails
@@ -199,7 +609,7 @@ class AIHandler:
             log_message(f"Error in analyze_sentiment: {e}", "ERROR")
             return {"sentiment": "error", "confidence": 0, "explanation": str(e)}
     
-    def generate_ideas(self, topic, count=5):
+    async def generate_ideas_async(self, topic, count=5):
         """
         Generate ideas about a given topic
         Args:
@@ -211,41 +621,20 @@ class AIHandler:
         if not self.client:
             return ["AI service is not available."]
         
-        def make_request():
+        async def make_request():
             messages = [
-                {
-                    "role": "system", 
-                    "content": f"Generate {count} creative and practical ideas about the topic. Return them as a numbered list."
-                },
+                {"role": "system", "content": self._IDEAS_SYS.format(count=count)},
                 {"role": "user", "content": f"Topic: {topic}"}
             ]
             
-            response = self.client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=messages,
-                max_tokens=400,
-                temperature=0.8,
-                timeout=OPENAI_TIMEOUT
-            )
-            
-            return response.choices[0].message.content.strip()
+            return await self._chat_completion(messages, max_tokens=400, temperature=0.8)
         
         try:
-            result = retry_operation(make_request)
+            result = await make_request()
             
             if result:
-                # Parse the numbered list
-                ideas = []
-                lines = result.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line and (line[0].isdigit() or line.startswith('-') or line.startswith('•')):
-                        # Remove numbering and clean up
-                        idea = line.split('.', 1)[-1].strip() if '.' in line else line[1:].strip()
-                        if idea:
-                            ideas.append(idea)
-                
-                return ideas[:count] if ideas else [result]
+                # Parse the numbered or bulleted list
+                return IDEA_LINE_PATTERN.findall(result)[:count] or [result]
             else:
                 return ["I couldn't generate ideas right now."]
                 
@@ -253,7 +642,15 @@ class AIHandler:
             log_message(f"Error in generate_ideas: {e}", "ERROR")
             return ["I encountered an error while generating ideas."]
     
-    def explain_concept(self, concept, complexity="simple"):
+    def _explain_messages(self, concept, complexity):
+        """Build the chat messages for explaining a concept"""
+        instruction = self._COMPLEXITY_INSTRUCTIONS.get(complexity, self._COMPLEXITY_INSTRUCTIONS["simple"])
+        return [
+            {"role": "system", "content": instruction},
+            {"role": "user", "content": f"Explain: {concept}"}
+        ]
+    
+    async def explain_concept_async(self, concept, complexity="simple"):
         """
         Explain a concept at different complexity levels
         Args:
@@ -265,32 +662,12 @@ class AIHandler:
         if not self.client:
             return "AI service is not available."
         
-        complexity_instructions = {
-            "simple": "Explain this concept in simple terms that a child could understand. Use analogies and examples.",
-            "intermediate": "Provide a clear explanation suitable for a high school student. Include key details and examples.",
-            "advanced": "Give a comprehensive explanation with technical details, suitable for someone studying the subject."
-        }
-        
-        instruction = complexity_instructions.get(complexity, complexity_instructions["simple"])
-        
-        def make_request():
-            messages = [
-                {"role": "system", "content": instruction},
-                {"role": "user", "content": f"Explain: {concept}"}
-            ]
-            
-            response = self.client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=messages,
-                max_tokens=600,
-                temperature=0.5,
-                timeout=OPENAI_TIMEOUT
-            )
-            
-            return response.choices[0].message.content.strip()
+        async def make_request():
+            messages = self._explain_messages(concept, complexity)
+            return await self._semantic_completion(f"explain:{complexity}", concept, messages, max_tokens=600, temperature=0.5)
         
         try:
-            explanation = retry_operation(make_request)
+            explanation = await make_request()
             
             if explanation:
                 log_message(f"Explained concept: {concept} (complexity: {complexity})")
@@ -302,7 +679,7 @@ class AIHandler:
             log_message(f"Error in explain_concept: {e}", "ERROR")
             return "I encountered an error while explaining."
     
-    def translate_text(self, text, target_language):
+    async def translate_text_async(self, text, target_language):
         """
         Translate text to target language
         Args:
@@ -314,27 +691,20 @@ class AIHandler:
         if not self.client:
             return "AI service is not available."
         
-        def make_request():
+        async def make_request():
             messages = [
-                {
-                    "role": "system", 
-                    "content": f"Translate the following text to {target_language}. Only provide the translation, no additional text."
-                },
+                {"role": "system", "content": self._TRANSLATE_SYS.format(language=target_language)},
                 {"role": "user", "content": text}
             ]
             
-            response = self.client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=messages,
-                max_tokens=len(text.split()) * 3,  # Allow for language expansion
-                temperature=0.1,
-                timeout=OPENAI_TIMEOUT
+            return await self._chat_completion(
+                messages,
+                max_tokens=translation_token_budget(text, target_language),
+                temperature=0.1
             )
-            
-            return response.choices[0].message.content.strip()
         
         try:
-            translation = retry_operation(make_request)
+            translation = await make_request()
             
             if translation:
                 log_message(f"Translated text to {target_language}")
@@ -346,7 +716,7 @@ class AIHandler:
             log_message(f"Error in translate_text: {e}", "ERROR")
             return "I encountered an error while translating."
     
-    def solve_math_problem(self, problem):
+    async def solve_math_problem_async(self, problem):
         """
         Solve a math problem with step-by-step explanation
         Args:
@@ -357,27 +727,16 @@ class AIHandler:
         if not self.client:
             return "AI service is not available."
         
-        def make_request():
+        async def make_request():
             messages = [
-                {
-                    "role": "system", 
-                    "content": "Solve the math problem step by step. Show your work and explain each step clearly."
-                },
+                {"role": "system", "content": self._MATH_SYS},
                 {"role": "user", "content": f"Solve: {problem}"}
             ]
             
-            response = self.client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=messages,
-                max_tokens=500,
-                temperature=0.1,
-                timeout=OPENAI_TIMEOUT
-            )
-            
-            return response.choices[0].message.content.strip()
+            return await self._chat_completion(messages, max_tokens=500, temperature=0.1)
         
         try:
-            solution = retry_operation(make_request)
+            solution = await make_request()
             
             if solution:
                 log_message(f"Solved math problem: {problem}")
@@ -389,6 +748,374 @@ class AIHandler:
             log_message(f"Error in solve_math_problem: {e}", "ERROR")
             return "I encountered an error while solving the problem."
     
+    async def summarize_text_stream_async(self, text, max_length=100):
+        """
+        Summarize text, yielding the summary as it is generated
+        Args:
+            text (str): Text to summarize
+            max_length (int): Maximum length of summary in words
+        Yields:
+            str: Pieces of the summary or an error message
+        """
+        if not self.client:
+            yield "AI service is not available."
+            return
+        
+        if len(text.split()) < 20:
+            yield "The text is too short to summarize effectively."
+            return
+        
+        messages = [
+            {"role": "system", "content": self._SUMMARIZE_SYS.format(n=max_length)},
+            {"role": "user", "content": text}
+        ]
+        
+        try:
+            async for piece in self._stream_completion(messages, max_tokens=max_length * 2, temperature=0.3):
+                yield piece
+        except Exception as e:
+            log_message(f"Error in summarize_text_stream: {e}", "ERROR")
+            yield "I encountered an error while summarizing."
+    
+    async def explain_concept_stream_async(self, concept, complexity="simple"):
+        """
+        Explain a concept, yielding the explanation as it is generated
+        Args:
+            concept (str): Concept to explain
+            complexity (str): "simple", "intermediate", or "advanced"
+        Yields:
+            str: Pieces of the explanation or an error message
+        """
+        if not self.client:
+            yield "AI service is not available."
+            return
+        
+        messages = self._explain_messages(concept, complexity)
+        
+        try:
+            async for piece in self._stream_completion(messages, max_tokens=600, temperature=0.5):
+                yield piece
+        except Exception as e:
+            log_message(f"Error in explain_concept_stream: {e}", "ERROR")
+            yield "I encountered an error while explaining."
+    
+    async def solve_math_problem_stream_async(self, problem):
+        """
+        Solve a math problem, yielding the worked solution as it is generated
+        Args:
+            problem (str): Math problem to solve
+        Yields:
+            str: Pieces of the solution or an error message
+        """
+        if not self.client:
+            yield "AI service is not available."
+            return
+        
+        messages = [
+            {"role": "system", "content": self._MATH_SYS},
+            {"role": "user", "content": f"Solve: {problem}"}
+        ]
+        
+        try:
+            async for piece in self._stream_completion(messages, max_tokens=500, temperature=0.1):
+                yield piece
+        except Exception as e:
+            log_message(f"Error in solve_math_problem_stream: {e}", "ERROR")
+            yield "I encountered an error while solving the problem."
+    
+    async def ask_many_async(self, questions, context=None):
+        """Ask several independent questions concurrently"""
+        return list(await asyncio.gather(*(self.ask_question_async(q, context) for q in questions)))
+    
+    async def summarize_many_async(self, texts, max_length=100):
+        """Summarize several texts concurrently, one request each"""
+        return list(await asyncio.gather(*(self.summarize_text_async(t, max_length) for t in texts)))
+    
+    async def translate_many_async(self, texts, target_language):
+        """Translate several texts concurrently, one request each"""
+        return list(await asyncio.gather(*(self.translate_text_async(t, target_language) for t in texts)))
+    
+    def _chunk_for_batch(self, items):
+        """Split items into chunks that keep a packed prompt within AI_BATCH_TOKEN_BUDGET"""
+        avg_tokens = max(1, sum(len(item) for item in items) // (4 * len(items)))  # ~4 chars per token
+        chunk_size = max(1, min(len(items), AI_BATCH_TOKEN_BUDGET // avg_tokens))
+        return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    
+    def _parse_numbered_items(self, text, count):
+        """Split a numbered list response into exactly count answers"""
+        answers = {}
+        matches = list(NUMBERED_ITEM_PATTERN.finditer(text))
+        for match, next_match in zip(matches, matches[1:] + [None]):
+            end = next_match.start() if next_match else len(text)
+            answers[int(match.group(1))] = text[match.end():end].strip()
+        
+        return [answers.get(i, "") for i in range(1, count + 1)]
+    
+    async def _run_numbered_batch(self, instruction, items, max_tokens_for, temperature):
+        """
+        Pack independent prompts into one numbered request per chunk
+        Args:
+            instruction (str): System prompt describing what to do with each item
+            items (list): Prompts to pack
+            max_tokens_for: Function giving the completion budget for a chunk
+            temperature (float): Sampling temperature
+        Returns:
+            list: One answer per item, empty string where none came back
+        """
+        async def run_chunk(chunk):
+            numbered = "\n".join(f"{i}. {' '.join(item.split())}" for i, item in enumerate(chunk, 1))
+            messages = [
+                {"role": "system", "content": instruction},
+                {"role": "user", "content": numbered}
+            ]
+            
+            result = await self._chat_completion(messages, max_tokens=max_tokens_for(chunk), temperature=temperature)
+            return self._parse_numbered_items(result or "", len(chunk))
+        
+        chunk_results = await asyncio.gather(*(run_chunk(chunk) for chunk in self._chunk_for_batch(items)))
+        return [answer for chunk in chunk_results for answer in chunk]
+    
+    async def batch_translate_async(self, texts, target_language):
+        """
+        Translate several texts with one request per chunk
+        Args:
+            texts (list): Texts to translate
+            target_language (str): Target language (e.g., "Spanish", "French")
+        Returns:
+            list: Translations in the same order as texts
+        """
+        if not texts:
+            return []
+        if not self.client:
+            return ["AI service is not available."] * len(texts)
+        
+        instruction = self._BATCH_TRANSLATE_SYS.format(language=target_language)
+        
+        try:
+            translations = await self._run_numbered_batch(
+                instruction, texts,
+                max_tokens_for=lambda chunk: sum(translation_token_budget(text, target_language) for text in chunk),
+                temperature=0.1
+            )
+            log_message(f"Batch translated {len(texts)} texts to {target_language}")
+            return translations
+            
+        except Exception as e:
+            log_message(f"Error in batch_translate: {e}", "ERROR")
+            return ["I encountered an error while translating."] * len(texts)
+    
+    async def batch_summarize_async(self, texts, max_length=100):
+        """
+        Summarize several texts with one request per chunk
+        Args:
+            texts (list): Texts to summarize
+            max_length (int): Maximum length of each summary in words
+        Returns:
+            list: Summaries in the same order as texts
+        """
+        if not texts:
+            return []
+        if not self.client:
+            return ["AI service is not available."] * len(texts)
+        
+        instruction = self._BATCH_SUMMARIZE_SYS.format(n=max_length)
+        
+        try:
+            summaries = await self._run_numbered_batch(
+                instruction, texts,
+                max_tokens_for=lambda chunk: max_length * 2 * len(chunk),
+                temperature=0.3
+            )
+            log_message(f"Batch summarized {len(texts)} texts")
+            return summaries
+            
+        except Exception as e:
+            log_message(f"Error in batch_summarize: {e}", "ERROR")
+            return ["I encountered an error while summarizing."] * len(texts)
+    
+    async def batch_generate_ideas_async(self, topics, count=5):
+        """
+        Generate ideas for several topics with one request per chunk
+        Args:
+            topics (list): Topics to generate ideas about
+            count (int): Number of ideas per topic
+        Returns:
+            list: One list of ideas per topic
+        """
+        if not topics:
+            return []
+        if not self.client:
+            return [["AI service is not available."] for _ in topics]
+        
+        instruction = self._BATCH_IDEAS_SYS.format(count=count)
+        
+        try:
+            lines = await self._run_numbered_batch(
+                instruction, topics,
+                max_tokens_for=lambda chunk: 80 * count * len(chunk),
+                temperature=0.8
+            )
+            return [[idea.strip() for idea in line.split('|') if idea.strip()][:count] for line in lines]
+            
+        except Exception as e:
+            log_message(f"Error in batch_generate_ideas: {e}", "ERROR")
+            return [["I encountered an error while generating ideas."] for _ in topics]
+    
+    async def submit_batch_async(self, items):
+        """
+        Submit chat requests to the OpenAI Batch API (half price, 24h window)
+        Args:
+            items (list): Chat completion bodies, e.g. {"messages": [...], "max_tokens": 200}
+        Returns:
+            str: Batch ID, or None if submission failed
+        """
+        if not self.client:
+            log_message("Cannot submit batch: AI service is not available", "WARNING")
+            return None
+        
+        lines = []
+        for i, item in enumerate(items):
+            body = {"model": OPENAI_MODEL, **item}
+            lines.append(dumps_json({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body
+            }))
+        
+        try:
+            input_file = await self.client.files.create(
+                file=("batch.jsonl", b"\n".join(lines)),
+                purpose="batch"
+            )
+            batch = await self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            log_message(f"Submitted batch {batch.id} with {len(items)} requests")
+            return batch.id
+            
+        except Exception as e:
+            log_message(f"Error in submit_batch: {e}", "ERROR")
+            return None
+    
+    async def wait_for_batch_async(self, batch_id, poll_interval=AI_BATCH_POLL_INTERVAL, max_poll_interval=300):
+        """
+        Wait for a submitted batch to finish and collect its results
+        Args:
+            batch_id (str): ID returned by submit_batch
+            poll_interval (float): Initial seconds between status checks, doubled each time
+            max_poll_interval (float): Upper bound on seconds between status checks
+        Returns:
+            dict: Response text keyed by custom_id (None for failed requests)
+        """
+        if not self.client:
+            return {}
+        
+        try:
+            while True:
+                batch = await self.client.batches.retrieve(batch_id)
+                if batch.status in ("completed", "failed", "expired", "cancelled"):
+                    break
+                await asyncio.sleep(poll_interval)
+                poll_interval = min(poll_interval * 2, max_poll_interval)
+            
+            if batch.status != "completed" or not batch.output_file_id:
+                log_message(f"Batch {batch_id} ended with status {batch.status}", "WARNING")
+                return {}
+            
+            output = await self.client.files.content(batch.output_file_id)
+            results = {}
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                record = loads_json(line)
+                response = record.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+                else:
+                    results[record["custom_id"]] = None
+            
+            log_message(f"Batch {batch_id} completed with {len(results)} results")
+            return results
+            
+        except Exception as e:
+            log_message(f"Error in wait_for_batch: {e}", "ERROR")
+            return {}
+    
+    def ask_question(self, question, context=None):
+        """Blocking wrapper around ask_question_async"""
+        return self.run_sync(self.ask_question_async(question, context))
+    
+    def summarize_text(self, text, max_length=100):
+        """Blocking wrapper around summarize_text_async"""
+        return self.run_sync(self.summarize_text_async(text, max_length))
+    
+    def analyze_sentiment(self, text):
+        """Blocking wrapper around analyze_sentiment_async"""
+        return self.run_sync(self.analyze_sentiment_async(text))
+    
+    def generate_ideas(self, topic, count=5):
+        """Blocking wrapper around generate_ideas_async"""
+        return self.run_sync(self.generate_ideas_async(topic, count))
+    
+    def explain_concept(self, concept, complexity="simple"):
+        """Blocking wrapper around explain_concept_async"""
+        return self.run_sync(self.explain_concept_async(concept, complexity))
+    
+    def translate_text(self, text, target_language):
+        """Blocking wrapper around translate_text_async"""
+        return self.run_sync(self.translate_text_async(text, target_language))
+    
+    def solve_math_problem(self, problem):
+        """Blocking wrapper around solve_math_problem_async"""
+        return self.run_sync(self.solve_math_problem_async(problem))
+    
+    def summarize_text_stream(self, text, max_length=100):
+        """Blocking iterator over summarize_text_stream_async"""
+        return self.iterate_sync(self.summarize_text_stream_async(text, max_length))
+    
+    def explain_concept_stream(self, concept, complexity="simple"):
+        """Blocking iterator over explain_concept_stream_async"""
+        return self.iterate_sync(self.explain_concept_stream_async(concept, complexity))
+    
+    def solve_math_problem_stream(self, problem):
+        """Blocking iterator over solve_math_problem_stream_async"""
+        return self.iterate_sync(self.solve_math_problem_stream_async(problem))
+    
+    def ask_many(self, questions, context=None):
+        """Blocking wrapper around ask_many_async"""
+        return self.run_sync(self.ask_many_async(questions, context))
+    
+    def summarize_many(self, texts, max_length=100):
+        """Blocking wrapper around summarize_many_async"""
+        return self.run_sync(self.summarize_many_async(texts, max_length))
+    
+    def translate_many(self, texts, target_language):
+        """Blocking wrapper around translate_many_async"""
+        return self.run_sync(self.translate_many_async(texts, target_language))
+    
+    def batch_translate(self, texts, target_language):
+        """Blocking wrapper around batch_translate_async"""
+        return self.run_sync(self.batch_translate_async(texts, target_language))
+    
+    def batch_summarize(self, texts, max_length=100):
+        """Blocking wrapper around batch_summarize_async"""
+        return self.run_sync(self.batch_summarize_async(texts, max_length))
+    
+    def batch_generate_ideas(self, topics, count=5):
+        """Blocking wrapper around batch_generate_ideas_async"""
+        return self.run_sync(self.batch_generate_ideas_async(topics, count))
+    
+    def submit_batch(self, items):
+        """Blocking wrapper around submit_batch_async"""
+        return self.run_sync(self.submit_batch_async(items))
+    
+    def wait_for_batch(self, batch_id):
+        """Blocking wrapper around wait_for_batch_async"""
+        return self.run_sync(self.wait_for_batch_async(batch_id))
+    
     def add_to_history(self, user_message, assistant_response):
         """Add exchange to conversation history"""
         self.conversation_history.append({
@@ -396,14 +1123,14 @@ class AIHandler:
             "assistant": assistant_response,
             "timestamp": datetime.now().isoformat()
         })
-        
-        # Keep only recent history
-        if len(self.conversation_history) > self.max_history_length:
-            self.conversation_history = self.conversation_history[-self.max_history_length:]
+    
+    def recent_history(self, count):
+        """Iterate over the last count exchanges, oldest first"""
+        return islice(self.conversation_history, max(len(self.conversation_history) - count, 0), None)
     
     def clear_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.conversation_history.clear()
         log_message("Conversation history cleared")
     
     def get_history_summary(self):
@@ -412,7 +1139,7 @@ class AIHandler:
             return "No recent conversation history."
         
         history_text = ""
-        for entry in self.conversation_history[-3:]:  # Last 3 exchanges
+        for entry in self.recent_history(3):  # Last 3 exchanges
             history_text += f"User: {entry['user']}\nSarah: {entry['assistant']}\n\n"
         
         return f"Recent conversation:\n{history_text}"
@@ -421,49 +1148,105 @@ class AIHandler:
         """Check if AI service is available"""
         return self.client is not None
 
-# Create global AI handler instance
-ai_handler = AIHandler()
+@cache
+def get_ai_handler():
+    """Get the shared AI handler, creating it on first use"""
+    return AIHandler()
+
+# A forked child has no AI event loop thread, so it must build its own handler
+os.register_at_fork(after_in_child=get_ai_handler.cache_clear)
 
 # Convenience functions for easy import
 def ask_question(question, context=None):
     """Ask a question to the AI"""
-    return ai_handler.ask_question(question, context)
+    return get_ai_handler().ask_question(question, context)
 
 def summarize_text(text, max_length=100):
     """Summarize text"""
-    return ai_handler.summarize_text(text, max_length)
+    return get_ai_handler().summarize_text(text, max_length)
 
 def analyze_sentiment(text):
     """Analyze text sentiment"""
-    return ai_handler.analyze_sentiment(text)
+    return get_ai_handler().analyze_sentiment(text)
 
 def generate_ideas(topic, count=5):
     """Generate ideas about a topic"""
-    return ai_handler.generate_ideas(topic, count)
+    return get_ai_handler().generate_ideas(topic, count)
 
 def explain_concept(concept, complexity="simple"):
     """Explain a concept"""
-    return ai_handler.explain_concept(concept, complexity)
+    return get_ai_handler().explain_concept(concept, complexity)
 
 def translate_text(text, target_language):
     """Translate text"""
-    return ai_handler.translate_text(text, target_language)
+    return get_ai_handler().translate_text(text, target_language)
 
 def solve_math_problem(problem):
     """Solve math problem"""
-    return ai_handler.solve_math_problem(problem)
+    return get_ai_handler().solve_math_problem(problem)
+
+def summarize_text_stream(text, max_length=100):
+    """Summarize text, yielding pieces as they arrive"""
+    return get_ai_handler().summarize_text_stream(text, max_length)
+
+def explain_concept_stream(concept, complexity="simple"):
+    """Explain a concept, yielding pieces as they arrive"""
+    return get_ai_handler().explain_concept_stream(concept, complexity)
+
+def solve_math_problem_stream(problem):
+    """Solve a math problem, yielding pieces as they arrive"""
+    return get_ai_handler().solve_math_problem_stream(problem)
+
+def ask_many(questions, context=None):
+    """Ask several questions concurrently"""
+    return get_ai_handler().ask_many(questions, context)
+
+def summarize_many(texts, max_length=100):
+    """Summarize several texts concurrently"""
+    return get_ai_handler().summarize_many(texts, max_length)
+
+def translate_many(texts, target_language):
+    """Translate several texts concurrently"""
+    return get_ai_handler().translate_many(texts, target_language)
+
+def batch_translate(texts, target_language):
+    """Translate several texts in one request"""
+    return get_ai_handler().batch_translate(texts, target_language)
+
+def batch_summarize(texts, max_length=100):
+    """Summarize several texts in one request"""
+    return get_ai_handler().batch_summarize(texts, max_length)
+
+def batch_generate_ideas(topics, count=5):
+    """Generate ideas for several topics in one request"""
+    return get_ai_handler().batch_generate_ideas(topics, count)
+
+def submit_batch(items):
+    """Submit chat requests to the Batch API"""
+    return get_ai_handler().submit_batch(items)
+
+def wait_for_batch(batch_id):
+    """Wait for a submitted batch and return its results"""
+    return get_ai_handler().wait_for_batch(batch_id)
 
 def clear_conversation_history():
     """Clear conversation history"""
-    ai_handler.clear_history()
+    get_ai_handler().clear_history()
 
 def get_conversation_summary():
     """Get conversation summary"""
-    return ai_handler.get_history_summary()
+    return get_ai_handler().get_history_summary()
 
 def is_ai_available():
     """Check if AI is available"""
-    return ai_handler.is_available()
+    return get_ai_handler().is_available()
+
+def shutdown_ai():
+    """Close AI connections"""
+    if get_ai_handler.cache_info().currsize:
+        get_ai_handler().close()
+        # Drop the closed handler so the next call after a restart builds a new one
+        get_ai_handler.cache_clear()
 
 # Log successful module initialization
 log_message("AI module initialized successfully")
\ No newline at end of file
@@ -1,72 +1,282 @@
 # automation.py - Multi-step automation and workflows for Sarah AI Assistant
 
-import subprocess
+import asyncio
+import itertools
+import re
+import shutil
 import os
+import subprocess
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
+from functools import lru_cache
+from types import MappingProxyType
 import json
 from utils import log_message, speak, get_current_time
 from config import *
 
+# Step types that must finish before later steps start (ordering matters to the user)
+BARRIER_STEP_TYPES = {'wait', 'speak', 'system_command'}
+
+# Built-in routines, shared read-only by every handler
+DEFAULT_ROUTINES = MappingProxyType({
+    'morning_routine': {
+        'name': 'Morning Routine',
+        'description': 'Start your day with essential apps and information',
+        'steps': [
+            {'type': 'speak', 'content': 'Good morning! Starting your morning routine.'},
+            {'type': 'open_app', 'app': 'chrome'},
+            {'type': 'wait', 'seconds': 3},
+            {'type': 'open_url', 'url': 'https://gmail.com'},
+            {'type': 'wait', 'seconds': 2},
+            {'type': 'open_url', 'url': 'https://calendar.google.com', 'new_tab': True},
+            {'type': 'speak', 'content': 'Morning routine completed. Have a great day!'}
+        ]
+    },
+    'work_setup': {
+        'name': 'Work Setup',
+        'description': 'Prepare your workspace for productivity',
+        'steps': [
+            {'type': 'speak', 'content': 'Setting up your work environment.'},
+            {'type': 'open_app', 'app': 'code'},  # VS Code
+            {'type': 'open_app', 'app': 'slack'},
+            {'type': 'open_app', 'app': 'notion'},
+            {'type': 'speak', 'content': 'Work environment ready!'}
+        ]
+    },
+    'evening_routine': {
+        'name': 'Evening Routine',
+        'description': 'Wind down and prepare for tomorrow',
+        'steps': [
+            {'type': 'speak', 'content': 'Starting evening routine.'},
+            {'type': 'close_app', 'app': 'chrome'},
+            {'type': 'close_app', 'app': 'slack'},
+            {'type': 'open_app', 'app': 'spotify'},
+            {'type': 'speak', 'content': 'Evening routine completed. Good night!'}
+        ]
+    },
+    'system_cleanup': {
+        'name': 'System Cleanup',
+        'description': 'Clean temporary files and optimize system',
+        'steps': [
+            {'type': 'speak', 'content': 'Starting system cleanup.'},
+            {'type': 'system_command', 'command': 'cleanmgr /sagerun:1'},  # Windows
+            {'type': 'clear_temp_files'},
+            {'type': 'empty_recycle_bin'},
+            {'type': 'speak', 'content': 'System cleanup completed.'}
+        ]
+    }
+})
+
+# Friendly app names to executables (also the Windows process image names)
+APP_COMMANDS = {
+    'chrome': 'chrome.exe',
+    'firefox': 'firefox.exe',
+    'edge': 'msedge.exe',
+    'notepad': 'notepad.exe',
+    'calculator': 'calc.exe',
+    'code': 'code.exe',
+    'vscode': 'code.exe',
+    'slack': 'slack.exe',
+    'discord': 'discord.exe',
+    'spotify': 'spotify.exe',
+    'outlook': 'outlook.exe',
+    'word': 'winword.exe',
+    'excel': 'excel.exe',
+    'powerpoint': 'powerpnt.exe',
+    'notion': 'notion.exe'
+}
+
+# Browsers that open every URL passed on the command line as a tab of one window,
+# keyed by a fragment of their default-browser id (xdg .desktop name or Windows ProgId)
+MULTI_URL_BROWSERS = (
+    ('chromium', ('chromium', 'chromium-browser')),
+    ('chrome', ('google-chrome', 'google-chrome-stable', 'chrome.exe')),
+    ('edge', ('microsoft-edge', 'msedge.exe')),
+    ('firefox', ('firefox', 'firefox.exe'))
+)
+
+# Launched apps get no handle on Sarah's stdio and survive her exiting
+DETACHED_SPAWN_KWARGS = {
+    'stdin': subprocess.DEVNULL,
+    'stdout': subprocess.DEVNULL,
+    'stderr': subprocess.DEVNULL
+}
+if os.name == 'nt':
+    DETACHED_SPAWN_KWARGS['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+else:
+    DETACHED_SPAWN_KWARGS['start_new_session'] = True
+
+# Modifier-led key combos such as "ctrl+shift+s"; anything else is typed literally
+HOTKEY_PATTERN = re.compile(r'^(?:ctrl|alt|shift|win|cmd)(?:\+[^+]+)+$', re.IGNORECASE)
+
+# How far to move a repeating task after it fires
+REPEAT_INTERVALS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+    'monthly': timedelta(days=30)
+}
+
+# Input, browser and process modules are imported on first use; pyautogui alone
+# pulls in Pillow and tkinter, which sessions without click/send_keys steps never need
+_pyautogui = None
+_webbrowser = None
+_psutil = None
+
+def _get_pyautogui():
+    global _pyautogui
+    if _pyautogui is None:
+        import pyautogui as _pyautogui
+    return _pyautogui
+
+def _get_webbrowser():
+    global _webbrowser
+    if _webbrowser is None:
+        import webbrowser as _webbrowser
+    return _webbrowser
+
+def _get_psutil():
+    global _psutil
+    if _psutil is None:
+        import psutil as _psutil
+    return _psutil
+
+@lru_cache(maxsize=64)
+def resolve_command(command):
+    """Resolve an executable name to its absolute path once, falling back to the bare name"""
+    return shutil.which(command) or command
+
+def empty_directory(root):
+    """
+    Delete everything below a directory without following symlinks, keeping the directory itself
+    Args:
+        root (str): Directory to empty
+    Returns:
+        int: Number of files removed
+    """
+    removed = 0
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False, followlinks=False):
+        for filename in filenames:
+            try:
+                os.unlink(os.path.join(dirpath, filename))
+                removed += 1
+            except OSError:
+                continue
+        for dirname in dirnames:
+            path = os.path.join(dirpath, dirname)
+            try:
+                # Symlinked directories are listed here but were never walked
+                if os.path.islink(path):
+                    os.unlink(path)
+                else:
+                    os.rmdir(path)
+            except OSError:
+                continue
+    return removed
+
+def default_browser_id():
+    """Return the user's default browser id in lower case, or None if it can't be read"""
+    try:
+        if os.name == 'nt':
+            import winreg
+            key_path = r'Software\Microsoft\Windows\Shell\Associations\UrlAssociations\http\UserChoice'
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path) as key:
+                return winreg.QueryValueEx(key, 'ProgId')[0].lower()
+        
+        if shutil.which('xdg-settings'):
+            result = subprocess.run(
+                ['xdg-settings', 'get', 'default-web-browser'],
+                capture_output=True, text=True, timeout=5
+            )
+            return result.stdout.strip().lower() or None
+    except (OSError, subprocess.SubprocessError) as e:
+        log_message(f"Could not read the default browser: {e}", "DEBUG")
+    return None
+
+@lru_cache(maxsize=1)
+def find_browser():
+    """Return the default browser's path if it opens several URLs from one launch, or None"""
+    browser_id = default_browser_id()
+    if not browser_id:
+        return None
+    
+    for fragment, executables in MULTI_URL_BROWSERS:
+        if fragment in browser_id:
+            for executable in executables:
+                path = shutil.which(executable)
+                if path:
+                    return path
+            return None
+    return None
+
+def join_utterances(contents):
+    """Join speak step lines into one utterance, ending each with punctuation"""
+    return ' '.join(
+        content if content.endswith(('.', '!', '?')) else content + '.'
+        for content in (content.strip() for content in contents) if content
+    )
+
+@lru_cache(maxsize=256)
+def routine_key(name):
+    """Turn a routine display name such as "Morning Routine" into its template key"""
+    return name.lower().replace(' ', '_')
+
+@dataclass(slots=True)
+class ActiveRoutine:
+    """Progress of a routine that is currently running"""
+    name: str
+    started: datetime
+    current_step: int
+    total_steps: int
+    
+    def to_dict(self):
+        return asdict(self)
+
+@dataclass(slots=True)
+class ScheduledTask:
+    """A routine queued to run at a given time, optionally repeating"""
+    id: str
+    routine_name: str
+    schedule_time: datetime
+    repeat: str | None
+    created: datetime
+    active: bool = True
+    fire_mono: float = 0.0  # time.monotonic() deadline; schedule_time is for display only
+    
+    def to_dict(self):
+        return asdict(self)
+
 class AutomationHandler:
     def __init__(self):
         self.active_routines = {}
-        self.scheduled_tasks = []
+        self.scheduled_tasks = {}  # task_id -> task, active tasks only
         self.routine_templates = self.load_default_routines()
+        self._step_handlers = self._build_step_handlers()
+        self._take_screenshot = None  # Resolved from vision on first screenshot step
+        self._send_message = None  # Resolved from messages on first send_message step
+        
+        # Routine steps run as coroutines on a background event loop so
+        # waits and process launches never block the calling thread
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+        
+        # Scheduled tasks sit in the event loop's own timer heap (its clock is
+        # time.monotonic); task_id -> TimerHandle, only touched on the loop thread
+        self._timers = {}
+        self._task_ids = itertools.count(1)  # Keeps IDs unique within the same second
+    
+    def run_sync(self, coro):
+        """Run a coroutine on the automation event loop and block until it completes"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
     
     def load_default_routines(self):
         """Load default automation routines"""
-        return {
-            'morning_routine': {
-                'name': 'Morning Routine',
-                'description': 'Start your day with essential apps and information',
-                'steps': [
-                    {'type': 'speak', 'content': 'Good morning! Starting your morning routine.'},
-                    {'type': 'open_app', 'app': 'chrome'},
-                    {'type': 'wait', 'seconds': 3},
-                    {'type': 'open_url', 'url': 'https://gmail.com'},
-                    {'type': 'wait', 'seconds': 2},
-                    {'type': 'open_url', 'url': 'https://calendar.google.com', 'new_tab': True},
-                    {'type': 'speak', 'content': 'Morning routine completed. Have a great day!'}
-                ]
-            },
-            'work_setup': {
-                'name': 'Work Setup',
-                'description': 'Prepare your workspace for productivity',
-                'steps': [
-                    {'type': 'speak', 'content': 'Setting up your work environment.'},
-                    {'type': 'open_app', 'app': 'code'},  # VS Code
-                    {'type': 'open_app', 'app': 'slack'},
-                    {'type': 'open_app', 'app': 'notion'},
-                    {'type': 'speak', 'content': 'Work environment ready!'}
-                ]
-            },
-            'evening_routine': {
-                'name': 'Evening Routine',
-                'description': 'Wind down and prepare for tomorrow',
-                'steps': [
-                    {'type': 'speak', 'content': 'Starting evening routine.'},
-                    {'type': 'close_app', 'app': 'chrome'},
-                    {'type': 'close_app', 'app': 'slack'},
-                    {'type': 'open_app', 'app': 'spotify'},
-                    {'type': 'speak', 'content': 'Evening routine completed. Good night!'}
-                ]
-            },
-            'system_cleanup': {
-                'name': 'System Cleanup',
-                'description': 'Clean temporary files and optimize system',
-                'steps': [
-                    {'type': 'speak', 'content': 'Starting system cleanup.'},
-                    {'type': 'system_command', 'command': 'cleanmgr /sagerun:1'},  # Windows
-                    {'type': 'clear_temp_files'},
-                    {'type': 'empty_recycle_bin'},
-                    {'type': 'speak', 'content': 'System cleanup completed.'}
-                ]
-            }
-        }
+        return dict(DEFAULT_ROUTINES)
     
-    def run_routine(self, routine_name, custom_steps=None):
+    async def run_routine_async(self, routine_name, custom_steps=None):
         """
         Execute an automation routine
         Args:
@@ -76,40 +286,44 @@ class AutomationHandler:
             bool: True if successful, False otherwise
         """
         try:
+            # Display names ("Morning Routine") resolve to the same template as keys
+            routine = self.routine_templates.get(routine_key(routine_name))
+            
             if custom_steps:
                 steps = custom_steps
                 routine_display_name = routine_name
-            elif routine_name in self.routine_templates:
-                routine = self.routine_templates[routine_name]
+            elif routine is not None:
                 steps = routine['steps']
                 routine_display_name = routine['name']
             else:
-                speak(f"Unknown routine: {routine_name}")
+                await asyncio.to_thread(speak, f"Unknown routine: {routine_name}")
                 return False
             
             log_message(f"Starting routine: {routine_display_name}")
-            speak(f"Starting {routine_display_name.lower()}")
+            await asyncio.to_thread(speak, f"Starting {routine_display_name.lower()}")
             
             # Track active routine
             routine_id = f"{routine_name}_{int(time.time())}"
-            self.active_routines[routine_id] = {
-                'name': routine_display_name,
-                'started': datetime.now(),
-                'current_step': 0,
-                'total_steps': len(steps)
-            }
+            active_routine = ActiveRoutine(routine_display_name, datetime.now(), 0, len(steps))
+            self.active_routines[routine_id] = active_routine
             
             success_count = 0
+            step_number = 0
             
-            for i, step in enumerate(steps):
-                self.active_routines[routine_id]['current_step'] = i + 1
+            # Steps between barriers are independent and run concurrently
+            for group in self._partition_into_barriers(steps):
+                first = step_number + 1
+                step_number += len(group)
+                active_routine.current_step = step_number
                 
-                log_message(f"Executing step {i+1}/{len(steps)}: {step.get('type')}")
+                log_message(f"Executing steps {first}-{step_number}/{len(steps)}: {[step.get('type') for step in group]}")
                 
-                if self.execute_step(step):
-                    success_count += 1
-                else:
-                    log_message(f"Step {i+1} failed: {step}", "WARNING")
+                results = await self._run_group(group)
+                for offset, (step, result) in enumerate(zip(group, results)):
+                    if result is True:
+                        success_count += 1
+                    else:
+                        log_message(f"Step {first + offset} failed: {step}", "WARNING")
             
             # Mark routine as completed
             del self.active_routines[routine_id]
@@ -120,15 +334,133 @@ class AutomationHandler:
             if success_rate >= 0.8:  # 80% success rate
                 return True
             else:
-                speak("Routine completed with some issues.")
+                await asyncio.to_thread(speak, "Routine completed with some issues.")
                 return False
                 
         except Exception as e:
             log_message(f"Routine execution failed: {e}", "ERROR")
-            speak("Routine execution failed.")
+            await asyncio.to_thread(speak, "Routine execution failed.")
             return False
     
-    def execute_step(self, step):
+    def _partition_into_barriers(self, steps):
+        """
+        Split steps into groups that can run concurrently
+        Args:
+            steps (list): Step definitions in routine order
+        Yields:
+            list: Independent steps, a run of consecutive speak steps, or a single barrier step
+        """
+        group = []
+        speeches = []
+        for step in steps:
+            if step.get('type') == 'speak':
+                if group:
+                    yield group
+                    group = []
+                speeches.append(step)
+                continue
+            
+            if speeches:
+                yield speeches
+                speeches = []
+            
+            if step.get('type') in BARRIER_STEP_TYPES or step.get('barrier'):
+                if group:
+                    yield group
+                    group = []
+                yield [step]
+            else:
+                group.append(step)
+        
+        if group:
+            yield group
+        if speeches:
+            yield speeches
+    
+    async def _run_group(self, group):
+        """
+        Run independent steps concurrently, closing all of the group's apps in one process
+        sweep and opening all of its URLs with one browser launch
+        Returns:
+            list: One result (or exception) per step, in group order
+        """
+        if len(group) > 1 and all(step.get('type') == 'speak' for step in group):
+            # Chained lines become one utterance instead of one TTS call each
+            merged = {'type': 'speak', 'content': join_utterances(step.get('content', '') for step in group)}
+            result = await self.execute_step(merged)
+            return [result] * len(group)
+        
+        closes = [i for i, step in enumerate(group) if step.get('type') == 'close_app']
+        urls = [i for i, step in enumerate(group) if step.get('type') == 'open_url']
+        if len(urls) < 2:
+            urls = []  # A lone URL keeps its own new_tab setting
+        merged = set(closes) | set(urls)
+        others = [(i, step) for i, step in enumerate(group) if i not in merged]
+        
+        coroutines = [self.execute_step(step) for _, step in others]
+        batches = []
+        if closes:
+            coroutines.append(self.close_application(*(group[i].get('app', '') for i in closes)))
+            batches.append(closes)
+        if urls:
+            coroutines.append(self.open_urls([group[i].get('url', '') for i in urls]))
+            batches.append(urls)
+        
+        outcomes = await asyncio.gather(*coroutines, return_exceptions=True)
+        
+        results = [None] * len(group)
+        for (i, _), outcome in zip(others, outcomes):
+            results[i] = outcome
+        for indices, outcome in zip(batches, outcomes[len(others):]):
+            for i in indices:
+                results[i] = outcome
+        return results
+    
+    def _build_step_handlers(self):
+        """Map each step type to a coroutine function taking the step dict"""
+        # Blocking helpers run in worker threads to keep the event loop free
+        return {
+            'speak': self._speak_step,
+            'wait': self._wait_step,
+            'open_app': lambda step: self.open_application(step.get('app', '')),
+            'close_app': lambda step: self.close_application(step.get('app', '')),
+            'open_url': lambda step: asyncio.to_thread(self.open_url, step.get('url', ''), step.get('new_tab', False)),
+            'system_command': lambda step: self.run_system_command(step.get('command', '')),
+            'send_keys': lambda step: asyncio.to_thread(self.send_keys, step.get('keys', '')),
+            'click': lambda step: asyncio.to_thread(self.click_at_position, step.get('x', 0), step.get('y', 0)),
+            'clear_temp_files': lambda step: asyncio.to_thread(self.clear_temp_files),
+            'empty_recycle_bin': lambda step: self.empty_recycle_bin(),
+            'take_screenshot': self._screenshot_step,
+            'send_message': self._send_message_step
+        }
+    
+    async def _speak_step(self, step):
+        await asyncio.to_thread(speak, step.get('content', ''))
+        return True
+    
+    async def _wait_step(self, step):
+        await asyncio.sleep(step.get('seconds', 1))
+        return True
+    
+    async def _screenshot_step(self, step):
+        if self._take_screenshot is None:
+            from vision import take_screenshot
+            self._take_screenshot = take_screenshot
+        return await asyncio.to_thread(self._take_screenshot, step.get('filename')) is not None
+    
+    async def _send_message_step(self, step):
+        if self._send_message is None:
+            from messages import send_message
+            self._send_message = send_message
+        return await asyncio.to_thread(
+            self._send_message,
+            step.get('message_type', 'email'),
+            step.get('recipient', ''),
+            step.get('message', ''),
+            step.get('subject')
+        )
+    
+    async def execute_step(self, step):
         """
         Execute a single automation step
         Args:
@@ -138,97 +470,25 @@ class AutomationHandler:
         """
         try:
             step_type = step.get('type')
+            handler = self._step_handlers.get(step_type)
             
-            if step_type == 'speak':
-                content = step.get('content', '')
-                speak(content)
-                return True
-            
-            elif step_type == 'wait':
-                seconds = step.get('seconds', 1)
-                time.sleep(seconds)
-                return True
-            
-            elif step_type == 'open_app':
-                app_name = step.get('app', '')
-                return self.open_application(app_name)
-            
-            elif step_type == 'close_app':
-                app_name = step.get('app', '')
-                return self.close_application(app_name)
-            
-            elif step_type == 'open_url':
-                url = step.get('url', '')
-                new_tab = step.get('new_tab', False)
-                return self.open_url(url, new_tab)
-            
-            elif step_type == 'system_command':
-                command = step.get('command', '')
-                return self.run_system_command(command)
-            
-            elif step_type == 'send_keys':
-                keys = step.get('keys', '')
-                return self.send_keys(keys)
-            
-            elif step_type == 'click':
-                x = step.get('x', 0)
-                y = step.get('y', 0)
-                return self.click_at_position(x, y)
-            
-            elif step_type == 'clear_temp_files':
-                return self.clear_temp_files()
-            
-            elif step_type == 'empty_recycle_bin':
-                return self.empty_recycle_bin()
-            
-            elif step_type == 'take_screenshot':
-                filename = step.get('filename')
-                from vision import take_screenshot
-                return take_screenshot(filename) is not None
-            
-            elif step_type == 'send_message':
-                message_type = step.get('message_type', 'email')
-                recipient = step.get('recipient', '')
-                message = step.get('message', '')
-                subject = step.get('subject')
-                from messages import send_message
-                return send_message(message_type, recipient, message, subject)
-            
-            else:
+            if handler is None:
                 log_message(f"Unknown step type: {step_type}", "WARNING")
                 return False
+            
+            return await handler(step)
                 
         except Exception as e:
             log_message(f"Step execution failed: {e}", "ERROR")
             return False
     
-    def open_application(self, app_name):
+    async def open_application(self, app_name):
         """Open an application"""
         try:
-            app_commands = {
-                'chrome': 'chrome.exe',
-                'firefox': 'firefox.exe',
-                'edge': 'msedge.exe',
-                'notepad': 'notepad.exe',
-                'calculator': 'calc.exe',
-                'code': 'code.exe',
-                'vscode': 'code.exe',
-                'slack': 'slack.exe',
-                'discord': 'discord.exe',
-                'spotify': 'spotify.exe',
-                'outlook': 'outlook.exe',
-                'word': 'winword.exe',
-                'excel': 'excel.exe',
-                'powerpoint': 'powerpnt.exe',
-                'notion': 'notion.exe'
-            }
+            command = resolve_command(APP_COMMANDS.get(app_name.lower(), app_name))
             
-            command = app_commands.get(app_name.lower(), app_name)
-            
-            if os.name == 'nt':  # Windows
-                subprocess.Popen(command, shell=True)
-            else:  # macOS/Linux
-                subprocess.Popen([command])
+            # Launched apps outlive the routine, so the process is not awaited
+            await asyncio.create_subprocess_exec(command, **DETACHED_SPAWN_KWARGS)
             
             log_message(f"Opened application: {app_name}")
             return True
@@ -237,25 +497,50 @@ class AutomationHandler:
             log_message(f"Failed to open {app_name}: {e}", "ERROR")
             return False
     
-    def close_application(self, app_name):
-        """Close an application"""
+    def close_applications(self, app_names):
+        """
+        Terminate every running process matching any of the given apps in one sweep
+        Args:
+            app_names (set): Friendly app names or executable names
+        Returns:
+            int: Number of processes terminated
+        """
+        targets = set()
+        for app_name in app_names:
+            app_name = app_name.lower()
+            targets.add(app_name.removesuffix('.exe'))
+            targets.add(APP_COMMANDS.get(app_name, app_name).removesuffix('.exe'))
+        
+        psutil = _get_psutil()
+        killed = 0
+        for process in psutil.process_iter(['name']):
+            name = (process.info['name'] or '').lower().removesuffix('.exe')
+            if name in targets:
+                try:
+                    process.terminate()
+                    killed += 1
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+        
+        return killed
+    
+    async def close_application(self, *app_names):
+        """Close one or more applications"""
+        names = ', '.join(app_names)
         try:
-            if os.name == 'nt':  # Windows
-                subprocess.run(f'taskkill /f /im {app_name}.exe', shell=True, capture_output=True)
-            else:  # macOS/Linux
-                subprocess.run(['pkill', '-f', app_name], capture_output=True)
+            killed = await asyncio.to_thread(self.close_applications, set(app_names))
             
-            log_message(f"Closed application: {app_name}")
+            log_message(f"Closed application: {names} ({killed} processes)")
             return True
             
         except Exception as e:
-            log_message(f"Failed to close {app_name}: {e}", "ERROR")
+            log_message(f"Failed to close {names}: {e}", "ERROR")
             return False
     
     def open_url(self, url, new_tab=False):
         """Open URL in browser"""
         try:
-            import webbrowser
+            webbrowser = _get_webbrowser()
             
             if new_tab:
                 webbrowser.open_new_tab(url)
@@ -269,16 +554,45 @@ class AutomationHandler:
             log_message(f"Failed to open URL {url}: {e}", "ERROR")
             return False
     
-    def run_system_command(self, command):
+    async def open_urls(self, urls):
+        """
+        Open several URLs as tabs with a single browser launch
+        Args:
+            urls (list): URLs to open
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        browser = await asyncio.to_thread(find_browser)
+        if browser is None:
+            # Default browser unknown or not a multi-URL one; let webbrowser open each URL
+            results = await asyncio.gather(*(asyncio.to_thread(self.open_url, url, True) for url in urls))
+            return all(results)
+        
+        try:
+            # The browser outlives the routine, so it is launched detached and not waited on
+            await asyncio.to_thread(subprocess.Popen, [browser, *urls], **DETACHED_SPAWN_KWARGS)
+            
+            log_message(f"Opened URLs: {', '.join(urls)}")
+            return True
+            
+        except Exception as e:
+            log_message(f"Failed to open URLs {urls}: {e}", "ERROR")
+            return False
+    
+    async def run_system_command(self, command):
         """Run a system command"""
         try:
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
+            # stdout is never read; stderr stays bytes unless the command fails
+            process = await asyncio.create_subprocess_shell(
+                command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+            )
+            _, stderr = await process.communicate()
             
-            if result.returncode == 0:
+            if process.returncode == 0:
                 log_message(f"System command executed successfully: {command}")
                 return True
             else:
-                log_message(f"System command failed: {command} - {result.stderr}", "ERROR")
+                log_message(f"System command failed: {command} - {stderr.decode(errors='replace')}", "ERROR")
                 return False
                 
         except Exception as e:
@@ -288,15 +602,11 @@ class AutomationHandler:
     def send_keys(self, keys):
         """Send keyboard input"""
         try:
-            import pyautogui
+            pyautogui = _get_pyautogui()
             
             # Handle special keys
-            if keys.startswith('ctrl+'):
-                key_combo = keys.split('+')
-                pyautogui.hotkey(*key_combo)
-            elif keys.startswith('alt+'):
-                key_combo = keys.split('+')
-                pyautogui.hotkey(*key_combo)
+            if HOTKEY_PATTERN.match(keys):
+                pyautogui.hotkey(*keys.split('+'))
             else:
                 pyautogui.write(keys)
             
@@ -310,7 +620,7 @@ class AutomationHandler:
     def click_at_position(self, x, y):
         """Click at specific screen coordinates"""
         try:
-            import pyautogui
+            pyautogui = _get_pyautogui()
             pyautogui.click(x, y)
             
             log_message(f"Clicked at position: ({x}, {y})")
@@ -331,16 +641,22 @@ class AutomationHandler:
             
             files_deleted = 0
             
-            for temp_dir in temp_dirs:
-                if os.path.exists(temp_dir):
-                    for filename in os.listdir(temp_dir):
-                        try:
-                            file_path = os.path.join(temp_dir, filename)
-                            if os.path.isfile(file_path):
-                                os.remove(file_path)
-                                files_deleted += 1
-                        except:
-                            continue  # Skip files that can't be deleted
+            # scandir entries carry their file type, and unlinks overlap across threads
+            with ThreadPoolExecutor(max_workers=(os.cpu_count() or 4) * 2) as executor:
+                futures = []
+                for temp_dir in dict.fromkeys(temp_dirs):  # TEMP and TMP are often the same
+                    if not os.path.isdir(temp_dir):
+                        continue
+                    with os.scandir(temp_dir) as entries:
+                        for entry in entries:
+                            try:
+                                if entry.is_file(follow_symlinks=False):
+                                    futures.append(executor.submit(os.unlink, entry.path))
+                            except OSError:
+                                continue
+                
+                # Files that can't be deleted are skipped
+                files_deleted = sum(1 for future in as_completed(futures) if future.exception() is None)
             
             log_message(f"Deleted {files_deleted} temporary files")
             return True
@@ -349,28 +665,34 @@ class AutomationHandler:
             log_message(f"Failed to clear temp files: {e}", "ERROR")
             return False
     
-    def empty_recycle_bin(self):
+    async def empty_recycle_bin(self):
         """Empty the recycle bin"""
         try:
             if os.name == 'nt':  # Windows
-                subprocess.run('rd /s /q %systemdrive%\\$Recycle.bin', shell=True, capture_output=True)
+                trash_dirs = [os.path.join(os.environ.get('SYSTEMDRIVE', 'C:') + os.sep, '$Recycle.bin')]
             else:  # macOS/Linux
                 trash_dirs = [
                     os.path.expanduser('~/.Trash'),
                     os.path.expanduser('~/.local/share/Trash')
                 ]
-                
-                for trash_dir in trash_dirs:
-                    if os.path.exists(trash_dir):
-                        subprocess.run(['rm', '-rf', f'{trash_dir}/*'], shell=True)
             
-            log_message("Recycle bin emptied")
+            # Walk the trash directories in place instead of spawning a shell per directory
+            removed = await asyncio.gather(*(
+                asyncio.to_thread(empty_directory, trash_dir)
+                for trash_dir in trash_dirs if os.path.isdir(trash_dir)
+            ))
+            
+            log_message(f"Recycle bin emptied ({sum(removed)} files)")
             return True
             
         except Exception as e:
             log_message(f"Failed to empty recycle bin: {e}", "ERROR")
             return False
     
+    def run_routine(self, routine_name, custom_steps=None):
+        """Blocking wrapper around run_routine_async"""
+        return self.run_sync(self.run_routine_async(routine_name, custom_steps))
+    
     def schedule_routine(self, routine_name, schedule_time, repeat=None):
         """
         Schedule a routine to run at specific time
@@ -382,21 +704,15 @@ class AutomationHandler:
             str: Task ID if scheduled successfully, None otherwise
         """
         try:
-            task_id = f"scheduled_{routine_name}_{int(time.time())}"
-            
-            task = {
-                'id': task_id,
-                'routine_name': routine_name,
-                'schedule_time': schedule_time,
-                'repeat': repeat,
-                'created': datetime.now(),
-                'active': True
-            }
+            task_id = f"scheduled_{routine_name}_{int(time.time())}_{next(self._task_ids)}"
             
-            self.scheduled_tasks.append(task)
+            now = datetime.now()
+            task = ScheduledTask(task_id, routine_name, schedule_time, repeat, now)
+            # Scheduling math runs on the monotonic clock so NTP or DST steps can't shift it
+            task.fire_mono = time.monotonic() + (schedule_time - now).total_seconds()
             
-            # Start scheduler thread if not already running
-            self.start_scheduler()
+            self.scheduled_tasks[task_id] = task
+            self._loop.call_soon_threadsafe(self._arm_scheduled_task, task)
             
             log_message(f"Routine scheduled: {routine_name} at {schedule_time}")
             speak(f"Routine {routine_name} scheduled for {schedule_time.strftime('%I:%M %p')}")
@@ -408,52 +724,38 @@ class AutomationHandler:
             return None
     
     def start_scheduler(self):
-        """Start the task scheduler thread"""
-        if not hasattr(self, '_scheduler_running') or not self._scheduler_running:
-            self._scheduler_running = True
-            scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
-            scheduler_thread.start()
-            log_message("Task scheduler started")
-    
-    def _scheduler_loop(self):
-        """Main scheduler loop"""
-        while self._scheduler_running and self.scheduled_tasks:
-            try:
-                current_time = datetime.now()
-                
-                for task in self.scheduled_tasks[:]:  # Create a copy to iterate
-                    if not task.get('active', True):
-                        continue
-                    
-                    schedule_time = task['schedule_time']
-                    
-                    if current_time >= schedule_time:
-                        # Execute the routine
-                        routine_name = task['routine_name']
-                        log_message(f"Executing scheduled routine: {routine_name}")
-                        
-                        self.run_routine(routine_name)
-                        
-                        # Handle repeat scheduling
-                        repeat = task.get('repeat')
-                        if repeat:
-                            if repeat == 'daily':
-                                task['schedule_time'] = schedule_time + timedelta(days=1)
-                            elif repeat == 'weekly':
-                                task['schedule_time'] = schedule_time + timedelta(weeks=1)
-                            elif repeat == 'monthly':
-                                task['schedule_time'] = schedule_time + timedelta(days=30)
-                        else:
-                            # Remove one-time task
-                            self.scheduled_tasks.remove(task)
-                
-                time.sleep(60)  # Check every minute
-                
-            except Exception as e:
-                log_message(f"Scheduler error: {e}", "ERROR")
-                time.sleep(60)
+        """Start the task scheduler (tasks are armed on the event loop as they are scheduled)"""
+        log_message("Task scheduler started")
+    
+    def _arm_scheduled_task(self, task):
+        """Register a task's deadline with the event loop (loop thread only)"""
+        if task.active:
+            self._timers[task.id] = self._loop.call_at(task.fire_mono, self._fire_scheduled_task, task)
+    
+    def _disarm_scheduled_task(self, task_id):
+        """Cancel a task's pending timer (loop thread only)"""
+        timer = self._timers.pop(task_id, None)
+        if timer is not None:
+            timer.cancel()
+    
+    def _fire_scheduled_task(self, task):
+        """Start a due routine and reschedule it if it repeats"""
+        self._timers.pop(task.id, None)
+        if not task.active:
+            return
+        
+        routine_name = task.routine_name
+        log_message(f"Executing scheduled routine: {routine_name}")
+        self._loop.create_task(self.run_routine_async(routine_name))
         
-        self._scheduler_running = False
+        interval = REPEAT_INTERVALS.get(task.repeat)
+        if interval:
+            task.schedule_time += interval
+            task.fire_mono += interval.total_seconds()
+            self._arm_scheduled_task(task)
+        else:
+            # Remove one-time task
+            self.scheduled_tasks.pop(task.id, None)
     
     def create_custom_routine(self, name, description, steps):
         """
@@ -466,9 +768,7 @@ class AutomationHandler:
             bool: True if created successfully
         """
         try:
-            routine_key = name.lower().replace(' ', '_')
-            
-            self.routine_templates[routine_key] = {
+            self.routine_templates[routine_key(name)] = {
                 'name': name,
                 'description': description,
                 'steps': steps,
@@ -502,22 +802,23 @@ class AutomationHandler:
     
     def get_active_routines(self):
         """Get currently running routines"""
-        return self.active_routines.copy()
+        return {routine_id: routine.to_dict() for routine_id, routine in self.active_routines.items()}
     
     def get_scheduled_tasks(self):
         """Get scheduled tasks"""
-        return [task for task in self.scheduled_tasks if task.get('active', True)]
+        return [task.to_dict() for task in self.scheduled_tasks.values()]
     
     def cancel_scheduled_task(self, task_id):
         """Cancel a scheduled task"""
-        for task in self.scheduled_tasks:
-            if task['id'] == task_id:
-                task['active'] = False
-                log_message(f"Scheduled task cancelled: {task_id}")
-                speak("Scheduled task cancelled")
-                return True
+        task = self.scheduled_tasks.pop(task_id, None)
+        if task is None:
+            return False
         
-        return False
+        task.active = False
+        self._loop.call_soon_threadsafe(self._disarm_scheduled_task, task_id)
+        log_message(f"Scheduled task cancelled: {task_id}")
+        speak("Scheduled task cancelled")
+        return True
     
     def iot_control(self, device_type, action, device_id=None):
         """
@@ -1,8 +1,15 @@
 # config.py - Configuration file for Sarah AI Assistant
 
+import os
+import re
+
 # User Configuration
 USER_NAME = "User"  # Your name - Sarah will use this to address you
 WAKE_WORDS = ["sarah", "hey sarah", "ok sarah"]  # Words that activate Sarah
+# Longest phrases first so "hey sarah" is reported instead of "sarah"
+WAKE_WORD_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(w.lower()) for w in sorted(WAKE_WORDS, key=len, reverse=True)) + r")\b"
+)
 
 # Voice Settings
 VOICE_RATE = 180  # Speech speed (words per minute)
@@ -12,19 +19,41 @@ VOICE_ID = 0  # Voice ID (0 for default, 1 for alternate if available)
 # OpenAI Configuration
 OPENAI_API_KEY = "your-openai-api-key-here"  # Get from https://platform.openai.com/
 OPENAI_MODEL = "gpt-3.5-turbo"  # or "gpt-4" if you have access
+AI_CACHE_SIZE = 10000  # Maximum number of cached AI responses
+AI_CACHE_MAX_TEMPERATURE = 0.5  # Only cache responses requested at or below this temperature
+AI_EMBEDDING_MODEL = "text-embedding-3-small"  # Used to match near-duplicate questions
+AI_SEMANTIC_CACHE_THRESHOLD = 0.92  # Cosine similarity needed to reuse a previous answer
+AI_SEMANTIC_CACHE_SIZE = 2000  # Maximum remembered prompts per cache namespace
+AI_BATCH_TOKEN_BUDGET = 4000  # Approximate prompt tokens packed into one batched request
+AI_BATCH_POLL_INTERVAL = 10  # Initial seconds between Batch API status checks
+AI_REQUESTS_PER_MINUTE = 3500  # OpenAI request rate limit for your account tier
+AI_TOKENS_PER_MINUTE = 90000  # OpenAI token rate limit for your account tier
+AI_MAX_CONCURRENT = int(os.environ.get("AI_MAX_CONCURRENT", 32))  # Maximum in-flight OpenAI requests
+AI_RETRY_ATTEMPTS = 6  # Total attempts for rate-limited or failed OpenAI requests
+AI_RETRY_MAX_WAIT = 60  # Upper bound in seconds on the backoff between attempts
 
 # Email Configuration (Gmail)
 EMAIL_ADDRESS = "your-email@gmail.com"
 EMAIL_PASSWORD = "your-app-password"  # Use Gmail App Password, not regular password
 DEFAULT_EMAIL_RECIPIENT = "recipient@example.com"
+MAX_SCHEDULED_MESSAGES = 1024  # Pending scheduled messages allowed before new ones are refused
+EMAIL_KEEPALIVE_SECONDS = 120  # Idle SMTP connections are pinged this often so the server keeps them open
 
 # Telegram Configuration
 TELEGRAM_BOT_TOKEN = "your-telegram-bot-token"  # Get from @BotFather on Telegram
 TELEGRAM_CHAT_ID = "your-chat-id"  # Your Telegram chat ID
+TELEGRAM_POLL_TIMEOUT = 0  # Seconds to wait for new Telegram messages; 0 returns at once, set >0 for long polling
 
 # WhatsApp Configuration (via pywhatkit)
 WHATSAPP_DEFAULT_CONTACT = "+1234567890"  # Default contact number with country code
 
+# Bulk messaging pace per channel: (burst size, sustained messages per second)
+MESSAGE_RATE_LIMITS = {
+    "email": (10, 5),
+    "telegram": (30, 30),
+    "whatsapp": (5, 1)
+}
+
 # Computer Vision Settings
 TESSERACT_PATH = r"C:\Program Files\Tesseract-OCR\tesseract.exe"  # Windows path
 # TESSERACT_PATH = "/usr/bin/tesseract"  # Linux/Mac path
@@ -46,6 +75,12 @@ MORNING_ROUTINE_APPS = [
 # Media Settings
 YOUTUBE_SEARCH_RESULTS = 1  # Number of YouTube results to show
 SPOTIFY_DEVICE_NAME = None  # Leave None for default device
+SPOTIFY_CLIENT_ID = ""  # From https://developer.spotify.com/dashboard (leave empty to open web search instead)
+SPOTIFY_CLIENT_SECRET = ""
+SEARCH_CACHE_SECONDS = 86400  # Reuse YouTube/Spotify lookups this recent (24 hours)
+SEARCH_CACHE_SIZE = 256  # Maximum remembered YouTube/Spotify lookups
+SEARCH_FUZZY_THRESHOLD = 0.85  # Word overlap needed to reuse a lookup for a reworded query
+MEDIA_INDEX_MAX_AGE = 86400  # Rescan a local media folder when its index is older than this (seconds)
 
 # File Paths
 SCREENSHOTS_DIR = "screenshots"
@@ -56,18 +91,26 @@ DATA_DIR = "data"
 MICROPHONE_TIMEOUT = 1  # Seconds to wait for speech
 MICROPHONE_PHRASE_TIMEOUT = 3  # Seconds of silence before stopping
 RECOGNITION_LANGUAGE = "en-US"  # Language for speech recognition
+WAKE_BUFFER_SECONDS = 2  # Longest phrase captured per wake word decode
+COMMAND_BUFFER_SECONDS = 10  # Longest phrase captured per command decode
 
 # Wake Word Detection Settings
 WAKE_WORD_TIMEOUT = 0.5  # Time to listen for wake word
 WAKE_WORD_SENSITIVITY = 0.7  # Sensitivity threshold (0.0 to 1.0)
+WAKE_WORD_PROCESS = False  # Run wake word detection in its own process instead of a thread
+WAKE_WORD_REFRACTORY_MS = 800  # Ignore detections this soon after the last activation ended
 
 # Error Handling
 MAX_RETRIES = 3  # Maximum retries for failed operations
 RETRY_DELAY = 1  # Seconds to wait between retries
+MESSAGE_RETRY_MAX_WAIT = 30  # Upper bound in seconds on the backoff between message send attempts
 
 # Debug Settings
 DEBUG_MODE = True  # Set to False in production
 LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
+ELEVATED_PRIORITY = False  # Ask the OS to schedule Sarah's control thread ahead of normal work
+SINGLE_CORE_MODE = False  # Pin Sarah to CPU 0 (small single-core boards)
+DIAGNOSTIC_CACHE_SECONDS = 60  # Reuse diagnostic results this recent unless forced
 
 # API Timeouts
 OPENAI_TIMEOUT = 30  # Seconds
@@ -1,21 +1,602 @@
 # media.py - Media control and playback for YouTube, Spotify, and local files
 
-import pywhatkit as pwk
 import webbrowser
 import subprocess
 import os
-import requests
+import queue
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import atexit
+import itertools
 import json
+import sys
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
 from urllib.parse import quote
-from utils import log_message, speak, retry_operation
+from utils import log_message, speak
 from config import *
 
+# pywhatkit imports pyautogui and Pillow and checks the network connection when
+# loaded, so both are imported the first time a command actually needs them
+_pywhatkit = None
+_pyautogui = None
+
+def _get_pywhatkit():
+    global _pywhatkit
+    if _pywhatkit is None:
+        import pywhatkit as _pywhatkit
+    return _pywhatkit
+
+def _get_pyautogui():
+    global _pyautogui
+    if _pyautogui is None:
+        import pyautogui as _pyautogui
+    return _pyautogui
+
+# Platform key used by MEDIA_APP_COMMANDS; anything that isn't macOS or Linux is treated as Windows
+if sys.platform == 'darwin':
+    SYSTEM = 'darwin'
+elif sys.platform.startswith('linux'):
+    SYSTEM = 'linux'
+else:
+    SYSTEM = 'windows'
+
+# Opens a file with its default application on POSIX systems
+OPEN_COMMAND = 'open' if sys.platform == 'darwin' else 'xdg-open'
+
+MEDIA_APP_COMMANDS = {
+    'spotify': {
+        'windows': 'spotify.exe',
+        'darwin': 'open -a Spotify',
+        'linux': 'spotify'
+    },
+    'youtube': {
+        'windows': 'start https://youtube.com',
+        'darwin': 'open https://youtube.com',
+        'linux': 'xdg-open https://youtube.com'
+    },
+    'vlc': {
+        'windows': 'vlc.exe',
+        'darwin': 'open -a VLC',
+        'linux': 'vlc'
+    }
+}
+
+@lru_cache(maxsize=32)
+def resolve_command(command):
+    """Resolve an executable name to its absolute path once, falling back to the bare name"""
+    return shutil.which(command) or command
+
+def platform_command(command):
+    """
+    Prepare a launch command for Popen
+    Args:
+        command (str): Command line, or None if the app isn't available
+    Returns:
+        tuple: (args, use_shell), or None if there is no command
+    """
+    if not command:
+        return None
+    if SYSTEM == 'windows' and command.startswith('start '):
+        return command, True  # start is a cmd.exe builtin
+    return command.split(), False
+
+# This platform's launch command for each app, prepared once
+PLATFORM_APP_COMMANDS = {
+    app: platform_command(commands.get(SYSTEM))
+    for app, commands in MEDIA_APP_COMMANDS.items()
+}
+
+# Suggestions for the media type played most in recent history
+HISTORY_RECOMMENDATIONS = {
+    'youtube': (
+        "Popular music videos",
+        "Trending videos",
+        "Educational content"
+    ),
+    'spotify': (
+        "Discover Weekly",
+        "Release Radar",
+        "Daily Mix"
+    )
+}
+
+GENERIC_RECOMMENDATIONS = (
+    "Popular music",
+    "Latest movies",
+    "Trending videos",
+    "Podcasts"
+)
+
+# Spoken confirmations queue here so media commands return before TTS finishes;
+# a burst beyond the queue's size is dropped rather than delaying later replies
+_speech_q = queue.Queue(maxsize=8)
+_speech_worker = None
+_speech_worker_lock = threading.Lock()
+
+def _speak_queued():
+    for text in iter(_speech_q.get, None):
+        try:
+            speak(text)
+        except Exception as e:
+            log_message(f"Media confirmation speech failed: {e}", "ERROR")
+        finally:
+            _speech_q.task_done()
+
+def say(text):
+    """
+    Speak a confirmation in the background, starting the speech thread on first use
+    Args:
+        text (str): What to say
+    """
+    global _speech_worker
+    if _speech_worker is None:
+        with _speech_worker_lock:
+            if _speech_worker is None:
+                _speech_worker = threading.Thread(target=_speak_queued, name="media-speech", daemon=True)
+                _speech_worker.start()
+    
+    try:
+        _speech_q.put_nowait(text)
+    except queue.Full:
+        log_message(f"Dropped media confirmation: {text}", "DEBUG")
+
+def wait_for_speech():
+    """Block until every queued confirmation has been spoken, so the microphone doesn't hear it"""
+    if _speech_worker is not None:
+        _speech_q.join()
+
+# Players and apps get no handle on Sarah's stdio and keep running if she exits
+DETACHED_SPAWN_KWARGS = {
+    'stdin': subprocess.DEVNULL,
+    'stdout': subprocess.DEVNULL,
+    'stderr': subprocess.DEVNULL
+}
+if os.name == 'nt':
+    DETACHED_SPAWN_KWARGS['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+else:
+    DETACHED_SPAWN_KWARGS['start_new_session'] = True
+
+AUDIO_EXTENSIONS = frozenset({'.mp3', '.wav', '.flac', '.m4a', '.aac'})
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.avi', '.mkv', '.mov', '.wmv'})
+MEDIA_EXTENSIONS = AUDIO_EXTENSIONS | VIDEO_EXTENSIONS
+
+DEFAULT_MEDIA_DIRS = (
+    os.path.expanduser("~/Music"),
+    os.path.expanduser("~/Videos"),
+    os.path.expanduser("~/Downloads")
+)
+
+SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
+SPOTIFY_SEARCH_URL = "https://api.spotify.com/v1/search"
+SPOTIFY_MAX_CONCURRENT = 5  # Parallel track searches in play_spotify_tracks
+
+MEDIA_INDEX_FILE = os.path.join(DATA_DIR, 'media_index.sqlite')
+MEDIA_HISTORY_FILE = os.path.join(DATA_DIR, 'media_history.json')
+PLAYLISTS_FILE = os.path.join(DATA_DIR, 'playlists.json')
+
+# The trigram tokenizer lets MATCH find any substring of three or more characters,
+# which is what the filename search has always done
+MEDIA_INDEX_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS media USING fts5(
+    filename, path UNINDEXED, directory UNINDEXED, root UNINDEXED,
+    size UNINDEXED, mtime UNINDEXED, tokenize = 'trigram'
+);
+CREATE TABLE IF NOT EXISTS media_roots (root TEXT PRIMARY KEY, scanned_at REAL);
+"""
+
+def iter_files(directory):
+    """
+    Yield every file below a directory, skipping folders that can't be read
+    Args:
+        directory (str): Folder to scan
+    Yields:
+        tuple: (containing folder, os.DirEntry) for each file
+    """
+    pending = [directory]
+    seen_dirs = set()  # (st_dev, st_ino) of folders already scanned, e.g. reached again via a bind mount
+    while pending:
+        root = pending.pop()
+        try:
+            stat = os.stat(root)
+            if (stat.st_dev, stat.st_ino) in seen_dirs:
+                continue
+            seen_dirs.add((stat.st_dev, stat.st_ino))
+            
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file():
+                        yield root, entry
+        except OSError:
+            continue  # Missing or unreadable folder, same as os.walk
+
+def collapse_media_dirs(media_dirs):
+    """
+    Resolve media folders and drop any that another one already covers
+    Args:
+        media_dirs (list): Folders to search
+    Returns:
+        list: Real paths in their original order, without duplicates or nested folders
+    """
+    resolved = list(dict.fromkeys(os.path.realpath(directory) for directory in media_dirs))
+    return [
+        directory for directory in resolved
+        if not any(
+            other != directory and os.path.commonpath([directory, other]) == other
+            for other in resolved
+        )
+    ]
+
+def find_media_files(directory, search_term_lower):
+    """
+    Find media files below one folder whose names contain a search term
+    Args:
+        directory (str): Folder to scan
+        search_term_lower (str): Lower-cased search term
+    Returns:
+        list: Matching file information dictionaries
+    """
+    matching_files = []
+    for root, entry in iter_files(directory):
+        name_lower = entry.name.lower()
+        
+        if search_term_lower in name_lower and os.path.splitext(name_lower)[1] in MEDIA_EXTENSIONS:
+            matching_files.append({
+                'filename': entry.name,
+                'path': entry.path,
+                'directory': root,
+                'size': entry.stat().st_size
+            })
+    
+    return matching_files
+
+def scan_media_files(directory):
+    """
+    List every media file below one folder, for the search index
+    Args:
+        directory (str): Folder to scan
+    Returns:
+        list: (filename, path, folder, size, mtime) tuples
+    """
+    media_files = []
+    for root, entry in iter_files(directory):
+        if os.path.splitext(entry.name.lower())[1] in MEDIA_EXTENSIONS:
+            stat = entry.stat()
+            media_files.append((entry.name, entry.path, root, stat.st_size, stat.st_mtime))
+    
+    return media_files
+
+def load_json(path, default):
+    """
+    Load a JSON data file
+    Args:
+        path (str): File to read
+        default: Value returned when the file is missing or unreadable
+    Returns:
+        Parsed data or default
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except Exception as e:
+        log_message(f"Could not read {path}: {e}", "WARNING")
+        return default
+
+def save_json(path, data):
+    """Write a JSON data file, replacing the old one only once the new one is complete"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(temp_path, path)
+
+def spotify_api_enabled():
+    """Check whether Spotify Web API credentials are configured"""
+    return bool(SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET)
+
+def format_timestamp(value):
+    """Format a stored time.time() value as an ISO string (strings from older data pass through)"""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).isoformat()
+    return value
+
+def normalize_query(query):
+    """Lower-case a search query and collapse its whitespace for cache lookups"""
+    return ' '.join(query.lower().split())
+
+def query_signature(query):
+    """Get the set of words in a search query, used to match reworded repeats"""
+    return frozenset(re.findall(r'\w+', query.lower()))
+
+def jaccard_similarity(a, b):
+    """Get the Jaccard similarity of two sets (0.0 to 1.0)"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+@dataclass(slots=True)
+class CurrentMedia:
+    """The media item most recently started"""
+    type: str
+    title: str
+    path: str | None = None
+
 class MediaHandler:
     def __init__(self):
         self.current_media = None
-        self.media_history = []
+        self.media_history = deque(load_json(MEDIA_HISTORY_FILE, []), maxlen=50)  # Oldest entries fall off automatically
+        self.playlists = load_json(PLAYLISTS_FILE, {})
         self.volume_level = 50
         self.is_playing = False
+        self._search_cache = OrderedDict()  # key -> (cached_at, signature, results), oldest first
+        self._cache_lock = threading.Lock()
+        self._http = None
+        self._etags = OrderedDict()  # (url, params) -> (etag, parsed body), oldest first
+        self._spotify_token = None
+        self._spotify_token_expires = 0
+        self._spotify_lock = threading.Lock()
+        self._index = None
+        self._index_lock = threading.Lock()
+        self._index_failed = False
+        self._com_local = threading.local()  # Per-thread Windows volume interface
+        
+        # Disk writes go through one background writer so play commands never wait on them
+        self._write_q = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._saved_history = deque(self.media_history, maxlen=50)  # Writer thread's copy
+        self._saved_playlists = dict(self.playlists)  # Writer thread's copy
+    
+    def _persist(self, kind, item=None):
+        """
+        Queue a change for the background writer, starting it on first use
+        Args:
+            kind (str): 'history', 'clear_history' or 'playlist'
+            item: History entry or playlist to save
+        """
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    writer = threading.Thread(target=self._write_loop, name="media-writer", daemon=True)
+                    writer.start()
+                    atexit.register(self.flush_writes)
+                    self._writer = writer
+        self._write_q.put((kind, item))
+    
+    def _write_loop(self):
+        """Save queued changes, batching everything that piled up during the last write"""
+        while True:
+            batch = [self._write_q.get()]
+            while True:
+                try:
+                    batch.append(self._write_q.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                log_message(f"Failed to save media data: {e}", "ERROR")
+            finally:
+                for _ in batch:
+                    self._write_q.task_done()
+    
+    def _write_batch(self, batch):
+        """Apply a batch of queued changes and rewrite each affected file once"""
+        history_changed = playlists_changed = False
+        for kind, item in batch:
+            if kind == 'history':
+                self._saved_history.append(item)
+                history_changed = True
+            elif kind == 'clear_history':
+                self._saved_history.clear()
+                history_changed = True
+            elif kind == 'playlist':
+                self._saved_playlists[item['name']] = item
+                playlists_changed = True
+        
+        if history_changed:
+            save_json(MEDIA_HISTORY_FILE, list(self._saved_history))
+        if playlists_changed:
+            save_json(PLAYLISTS_FILE, self._saved_playlists)
+    
+    def flush_writes(self):
+        """Wait until every queued history and playlist change is on disk"""
+        if self._writer is not None:
+            self._write_q.join()
+    
+    def _find_similar(self, key):
+        """
+        Find the cached lookup whose query best matches a reworded one
+        Args:
+            key (tuple): Cache key (kind, normalized query, *options)
+        Returns:
+            tuple: Matching cache key, or None if nothing is similar enough
+        """
+        signature = query_signature(key[1])
+        if not signature:
+            return None
+        
+        best_key, best_similarity = None, SEARCH_FUZZY_THRESHOLD
+        for cached_key, (_, cached_signature, _) in self._search_cache.items():
+            if cached_key[0] != key[0] or cached_key[2:] != key[2:]:
+                continue
+            similarity = jaccard_similarity(signature, cached_signature)
+            if similarity > best_similarity:
+                best_key, best_similarity = cached_key, similarity
+        
+        return best_key
+    
+    def _get_cached(self, key):
+        """
+        Get a cached YouTube/Spotify lookup for the same or a near-identical query
+        Args:
+            key (tuple): Cache key (kind, normalized query, *options)
+        Returns:
+            Cached results, or None if missing or expired
+        """
+        with self._cache_lock:
+            if key not in self._search_cache:
+                key = self._find_similar(key)
+                if key is None:
+                    return None
+            
+            cached_at, _, results = self._search_cache[key]
+            if time.monotonic() - cached_at >= SEARCH_CACHE_SECONDS:
+                del self._search_cache[key]
+                return None
+            
+            self._search_cache.move_to_end(key)
+            return results
+    
+    def _put_cached(self, key, results):
+        """Cache a successful YouTube/Spotify lookup, evicting the least recently used"""
+        with self._cache_lock:
+            self._search_cache[key] = (time.monotonic(), query_signature(key[1]), results)
+            self._search_cache.move_to_end(key)
+            while len(self._search_cache) > SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+    
+    def clear_search_cache(self):
+        """Forget all cached YouTube/Spotify lookups"""
+        with self._cache_lock:
+            self._search_cache.clear()
+        log_message("Search cache cleared")
+    
+    def _get_http(self):
+        """Get the HTTP session used for web API calls, importing requests on first use"""
+        if self._http is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            
+            # Keep-alive connections are shared by the concurrent Spotify lookups, and
+            # throttled or failed GETs are retried on them without leaving urllib3
+            session = requests.Session()
+            retry = Retry(
+                total=3,
+                status_forcelist=[429, 500, 502, 503, 504],
+                backoff_factor=0.3,
+                respect_retry_after_header=True,
+                allowed_methods=['GET'],
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._http = session
+        return self._http
+    
+    def _get_json(self, url, params=None, headers=None):
+        """
+        GET a JSON resource, revalidating earlier responses with their ETag
+        Args:
+            url (str): Resource URL
+            params (dict): Query parameters
+            headers (dict): Extra request headers
+        Returns:
+            Parsed JSON body
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+        headers = dict(headers or {})
+        
+        with self._cache_lock:
+            cached = self._etags.get(key)
+        if cached:
+            headers['If-None-Match'] = cached[0]
+        
+        response = self._get_http().get(url, params=params, headers=headers, timeout=HTTP_REQUEST_TIMEOUT)
+        if response.status_code == 304 and cached:
+            with self._cache_lock:
+                if key in self._etags:
+                    self._etags.move_to_end(key)
+            return cached[1]
+        
+        response.raise_for_status()
+        data = response.json()
+        
+        etag = response.headers.get('ETag')
+        if etag:
+            with self._cache_lock:
+                self._etags[key] = (etag, data)
+                self._etags.move_to_end(key)
+                while len(self._etags) > SEARCH_CACHE_SIZE:
+                    self._etags.popitem(last=False)
+        
+        return data
+    
+    def _get_spotify_token(self):
+        """
+        Get a Spotify Web API access token, requesting a new one when it expires
+        Returns:
+            str: Bearer token
+        """
+        with self._spotify_lock:
+            if self._spotify_token is None or time.monotonic() >= self._spotify_token_expires:
+                response = self._get_http().post(
+                    SPOTIFY_TOKEN_URL,
+                    data={'grant_type': 'client_credentials'},
+                    auth=(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET),
+                    timeout=HTTP_REQUEST_TIMEOUT
+                )
+                response.raise_for_status()
+                token = response.json()
+                self._spotify_token = token['access_token']
+                # Renew a minute early so a token never expires mid-request
+                self._spotify_token_expires = time.monotonic() + token.get('expires_in', 3600) - 60
+            
+            return self._spotify_token
+    
+    def find_spotify_track(self, search_query):
+        """
+        Look up the best matching Spotify track through the Web API
+        Args:
+            search_query (str): Track search query
+        Returns:
+            dict: Track name, artists, uri and url, or None if nothing matched
+        """
+        key = ('spotify', normalize_query(search_query))
+        track = self._get_cached(key)
+        if track is not None:
+            return track
+        
+        results = self._get_json(
+            SPOTIFY_SEARCH_URL,
+            params={'q': search_query, 'type': 'track', 'limit': 1},
+            headers={'Authorization': f"Bearer {self._get_spotify_token()}"}
+        )
+        
+        items = results['tracks']['items']
+        if not items:
+            return None
+        
+        item = items[0]
+        track = {
+            'name': item['name'],
+            'artists': ', '.join(artist['name'] for artist in item['artists']),
+            'uri': item['uri'],
+            'url': item['external_urls']['spotify']
+        }
+        self._put_cached(key, track)
+        return track
+    
+    def _try_find_spotify_track(self, search_query):
+        """Look up a Spotify track, logging failures instead of raising"""
+        try:
+            return self.find_spotify_track(search_query)
+        except Exception as e:
+            log_message(f"Spotify lookup failed for '{search_query}': {e}", "WARNING")
+            return None
     
     def play_youtube_video(self, search_query, open_video=True):
         """
@@ -28,26 +609,32 @@ class MediaHandler:
         """
         try:
             if open_video:
-                # Use pywhatkit to play immediately
-                pwk.playonyt(search_query)
+                # Resolve the first result once, then reopen it directly on repeats
+                key = ('video', normalize_query(search_query))
+                video_url = self._get_cached(key)
+                if video_url is None:
+                    video_url = _get_pywhatkit().playonyt(search_query, open_video=False)
+                    if video_url:
+                        self._put_cached(key, video_url)
+                webbrowser.open(video_url)
                 log_message(f"Playing YouTube video: {search_query}")
-                speak(f"Playing {search_query} on YouTube.")
+                say(f"Playing {search_query} on YouTube.")
             else:
                 # Just get the URL without opening
                 search_url = f"https://www.youtube.com/results?search_query={quote(search_query)}"
                 log_message(f"YouTube search URL generated: {search_url}")
-                speak(f"Found YouTube search for {search_query}")
+                say(f"Found YouTube search for {search_query}")
             
             # Add to history
             self.add_to_history('youtube', search_query)
-            self.current_media = {'type': 'youtube', 'title': search_query}
+            self.current_media = CurrentMedia('youtube', search_query)
             self.is_playing = True
             
             return True
             
         except Exception as e:
             log_message(f"Failed to play YouTube video: {e}", "ERROR")
-            speak("Sorry, I couldn't play the YouTube video.")
+            say("Sorry, I couldn't play the YouTube video.")
             return False
     
     def search_youtube(self, query, max_results=5):
@@ -59,6 +646,12 @@ class MediaHandler:
         Returns:
             list: List of video information dictionaries
         """
+        key = ('search', normalize_query(query), max_results)
+        cached = self._get_cached(key)
+        if cached is not None:
+            log_message("YouTube search served from cache: %s", "INFO", query)
+            return list(cached)
+        
         try:
             # This is a simplified search - for production, use YouTube API
             search_url = f"https://www.youtube.com/results?search_query={quote(query)}"
@@ -71,8 +664,11 @@ class MediaHandler:
                 'description': f"YouTube search for {query}"
             }]
             
+            if results:
+                self._put_cached(key, results)
+            
             log_message(f"YouTube search completed: {query}")
-            return results
+            return list(results)
             
         except Exception as e:
             log_message(f"YouTube search failed: {e}", "ERROR")
@@ -87,24 +683,71 @@ class MediaHandler:
             bool: True if successful, False otherwise
         """
         try:
-            # Open Spotify search URL
-            spotify_search_url = f"https://open.spotify.com/search/{quote(search_query)}"
-            webbrowser.open(spotify_search_url)
+            track = self._try_find_spotify_track(search_query) if spotify_api_enabled() else None
             
-            log_message(f"Opening Spotify search: {search_query}")
-            speak(f"Searching for {search_query} on Spotify.")
+            if track:
+                # Go straight to the track instead of the search page
+                webbrowser.open(track['url'])
+                log_message(f"Opening Spotify track: {track['name']} by {track['artists']}")
+                say(f"Playing {track['name']} by {track['artists']} on Spotify.")
+            else:
+                # Open Spotify search URL
+                spotify_search_url = f"https://open.spotify.com/search/{quote(search_query)}"
+                webbrowser.open(spotify_search_url)
+                log_message(f"Opening Spotify search: {search_query}")
+                say(f"Searching for {search_query} on Spotify.")
             
             # Add to history
             self.add_to_history('spotify', search_query)
-            self.current_media = {'type': 'spotify', 'title': search_query}
+            self.current_media = CurrentMedia('spotify', search_query)
             
             return True
             
         except Exception as e:
             log_message(f"Failed to open Spotify: {e}", "ERROR")
-            speak("Sorry, I couldn't open Spotify.")
+            say("Sorry, I couldn't open Spotify.")
             return False
     
+    def play_spotify_tracks(self, search_queries):
+        """
+        Look up several Spotify tracks at once and play the first one found
+        Args:
+            search_queries (list): Track search queries
+        Returns:
+            list: Track information (None where nothing matched), in query order
+        """
+        if not search_queries:
+            return []
+        
+        if not spotify_api_enabled():
+            # Without API access all we can do is open a search for the first track
+            self.play_spotify_track(search_queries[0])
+            return [None] * len(search_queries)
+        
+        # Each search is one small request, so a few run side by side
+        with ThreadPoolExecutor(max_workers=min(SPOTIFY_MAX_CONCURRENT, len(search_queries))) as executor:
+            tracks = list(executor.map(self._try_find_spotify_track, search_queries))
+        
+        found = [track for track in tracks if track]
+        log_message(f"Found {len(found)} of {len(search_queries)} Spotify tracks")
+        
+        if not found:
+            say("Sorry, I couldn't find those tracks on Spotify.")
+            return tracks
+        
+        try:
+            first = found[0]
+            webbrowser.open(first['url'])
+            say(f"Found {len(found)} tracks. Playing {first['name']} by {first['artists']} on Spotify.")
+            
+            self.add_to_history('spotify', first['name'])
+            self.current_media = CurrentMedia('spotify', first['name'])
+        except Exception as e:
+            log_message(f"Failed to open Spotify: {e}", "ERROR")
+            say("Sorry, I couldn't open Spotify.")
+        
+        return tracks
+    
     def play_local_media(self, file_path):
         """
         Play local media file
@@ -114,41 +757,43 @@ class MediaHandler:
             bool: True if successful, False otherwise
         """
         try:
-            if not os.path.exists(file_path):
-                speak("Media file not found.")
+            try:
+                os.stat(file_path)
+            except OSError:
+                say("Media file not found.")
                 return False
             
             # Get file extension to determine media type
             file_ext = os.path.splitext(file_path)[1].lower()
             
-            if file_ext in ['.mp3', '.wav', '.flac', '.m4a', '.aac']:
+            if file_ext in AUDIO_EXTENSIONS:
                 media_type = 'audio'
-            elif file_ext in ['.mp4', '.avi', '.mkv', '.mov', '.wmv']:
+            elif file_ext in VIDEO_EXTENSIONS:
                 media_type = 'video'
             else:
-                speak("Unsupported media format.")
+                say("Unsupported media format.")
                 return False
             
             # Open with default system player
             if os.name == 'nt':  # Windows
                 os.startfile(file_path)
             elif os.name == 'posix':  # macOS and Linux
-                subprocess.call(['open' if os.uname().sysname == 'Darwin' else 'xdg-open', file_path])
+                subprocess.Popen([OPEN_COMMAND, file_path], **DETACHED_SPAWN_KWARGS)
             
             filename = os.path.basename(file_path)
             log_message(f"Playing local {media_type}: {filename}")
-            speak(f"Playing {filename}")
+            say(f"Playing {filename}")
             
             # Add to history
             self.add_to_history('local', filename)
-            self.current_media = {'type': 'local', 'title': filename, 'path': file_path}
+            self.current_media = CurrentMedia('local', filename, file_path)
             self.is_playing = True
             
             return True
             
         except Exception as e:
             log_message(f"Failed to play local media: {e}", "ERROR")
-            speak("Sorry, I couldn't play the media file.")
+            say("Sorry, I couldn't play the media file.")
             return False
     
     def control_media(self, action):
@@ -159,57 +804,90 @@ class MediaHandler:
         Returns:
             bool: True if successful, False otherwise
         """
+        action = action.lower()
+        entry = self.MEDIA_KEY_ACTIONS.get(action)
+        if entry is None:
+            say(f"Unknown media control action: {action}")
+            return False
+        
         try:
             # Use keyboard shortcuts for media control
-            import pyautogui
-            
-            action = action.lower()
-            
-            if action in ['play', 'pause', 'playpause']:
-                pyautogui.press('playpause')
-                self.is_playing = not self.is_playing
-                status = "playing" if self.is_playing else "paused"
-                speak(f"Media {status}")
-                
-            elif action == 'stop':
-                pyautogui.press('stop')
-                self.is_playing = False
-                speak("Media stopped")
-                
-            elif action in ['next', 'skip']:
-                pyautogui.press('nexttrack')
-                speak("Skipped to next track")
-                
-            elif action in ['previous', 'back']:
-                pyautogui.press('prevtrack')
-                speak("Going back to previous track")
-                
-            elif action in ['volumeup', 'louder']:
-                pyautogui.press('volumeup')
-                self.volume_level = min(100, self.volume_level + 10)
-                speak("Volume increased")
-                
-            elif action in ['volumedown', 'quieter']:
-                pyautogui.press('volumedown')
-                self.volume_level = max(0, self.volume_level - 10)
-                speak("Volume decreased")
-                
-            elif action == 'mute':
-                pyautogui.press('volumemute')
-                speak("Audio muted")
-                
-            else:
-                speak(f"Unknown media control action: {action}")
-                return False
+            key, after_press = entry
+            _get_pyautogui().press(key)
+            after_press(self)
             
             log_message(f"Media control executed: {action}")
             return True
             
         except Exception as e:
             log_message(f"Media control failed: {e}", "ERROR")
-            speak("Media control failed.")
+            say("Media control failed.")
             return False
     
+    def _get_endpoint_volume(self, refresh=False):
+        """
+        Get this thread's Windows master volume interface, activating it on first use
+        Args:
+            refresh (bool): Activate it again, e.g. after the output device changed
+        Returns:
+            IAudioEndpointVolume pointer
+        """
+        volume = None if refresh else getattr(self._com_local, 'endpoint_volume', None)
+        if volume is None:
+            from ctypes import cast, POINTER
+            from comtypes import CLSCTX_ALL
+            from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+            
+            devices = AudioUtilities.GetSpeakers()
+            interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+            volume = cast(interface, POINTER(IAudioEndpointVolume))
+            self._com_local.endpoint_volume = volume
+        
+        return volume
+    
+    def _toggled_playback(self):
+        self.is_playing = not self.is_playing
+        status = "playing" if self.is_playing else "paused"
+        say(f"Media {status}")
+    
+    def _stopped_playback(self):
+        self.is_playing = False
+        say("Media stopped")
+    
+    def _skipped_next(self):
+        say("Skipped to next track")
+    
+    def _skipped_previous(self):
+        say("Going back to previous track")
+    
+    def _raised_volume(self):
+        self.volume_level = min(100, self.volume_level + 10)
+        say("Volume increased")
+    
+    def _lowered_volume(self):
+        self.volume_level = max(0, self.volume_level - 10)
+        say("Volume decreased")
+    
+    def _muted(self):
+        say("Audio muted")
+    
+    # Action alias -> (media key to press, state update and confirmation afterwards)
+    MEDIA_KEY_ACTIONS = {
+        'play': ('playpause', _toggled_playback),
+        'pause': ('playpause', _toggled_playback),
+        'playpause': ('playpause', _toggled_playback),
+        'stop': ('stop', _stopped_playback),
+        'next': ('nexttrack', _skipped_next),
+        'skip': ('nexttrack', _skipped_next),
+        'previous': ('prevtrack', _skipped_previous),
+        'back': ('prevtrack', _skipped_previous),
+        'volumeup': ('volumeup', _raised_volume),
+        'louder': ('volumeup', _raised_volume),
+        'volumedown': ('volumedown', _lowered_volume),
+        'quieter': ('volumedown', _lowered_volume),
+        'mute': ('volumemute', _muted)
+    }
+    
     def set_volume(self, volume_percent):
         """
         Set system volume
@@ -223,29 +901,26 @@ class MediaHandler:
             
             if os.name == 'nt':  # Windows
                 # Use Windows-specific volume control
-                from ctypes import cast, POINTER
-                from comtypes import CLSCTX_ALL
-                from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-                
-                devices = AudioUtilities.GetSpeakers()
-                interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-                volume = cast(interface, POINTER(IAudioEndpointVolume))
-                volume.SetMasterScalarVolume(volume_percent / 100, None)
+                try:
+                    self._get_endpoint_volume().SetMasterScalarVolume(volume_percent / 100, None)
+                except Exception:
+                    # The cached interface goes stale when the default output device changes
+                    self._get_endpoint_volume(refresh=True).SetMasterScalarVolume(volume_percent / 100, None)
                 
             else:
                 # Use amixer for Linux/macOS (requires alsa-utils)
                 subprocess.run(['amixer', 'set', 'Master', f'{volume_percent}%'], 
-                             check=True, capture_output=True)
+                             check=True, capture_output=True, timeout=2)
             
             self.volume_level = volume_percent
             log_message(f"Volume set to {volume_percent}%")
-            speak(f"Volume set to {volume_percent} percent")
+            say(f"Volume set to {volume_percent} percent")
             
             return True
             
         except Exception as e:
             log_message(f"Failed to set volume: {e}", "ERROR")
-            speak("Sorry, I couldn't change the volume.")
+            say("Sorry, I couldn't change the volume.")
             return False
     
     def get_current_media_info(self):
@@ -254,14 +929,17 @@ class MediaHandler:
         Returns:
             dict: Current media information
         """
-        if not self.current_media:
+        media = self.current_media
+        if media is None:
             return {"status": "No media currently playing"}
         
-        info = self.current_media.copy()
-        info['is_playing'] = self.is_playing
-        info['volume'] = self.volume_level
-        
-        return info
+        return {
+            'type': media.type,
+            'title': media.title,
+            'path': media.path,
+            'is_playing': self.is_playing,
+            'volume': self.volume_level
+        }
     
     def search_local_media(self, search_term, media_dirs=None):
         """
@@ -273,37 +951,41 @@ class MediaHandler:
             list: List of matching files
         """
         if media_dirs is None:
-            # Default media directories
-            media_dirs = [
-                os.path.expanduser("~/Music"),
-                os.path.expanduser("~/Videos"),
-                os.path.expanduser("~/Downloads")
-            ]
-        
-        media_extensions = ['.mp3', '.wav', '.flac', '.m4a', '.aac', 
-                           '.mp4', '.avi', '.mkv', '.mov', '.wmv']
+            media_dirs = DEFAULT_MEDIA_DIRS
+        media_dirs = collapse_media_dirs(media_dirs)
         
-        matching_files = []
         search_term_lower = search_term.lower()
         
+        if not self._index_failed:
+            try:
+                self._ensure_index(media_dirs)
+                matching_files = self._search_index(search_term_lower, media_dirs)
+                log_message(f"Found {len(matching_files)} local media files matching '{search_term}'")
+                return matching_files
+            except sqlite3.Error as e:
+                # Older SQLite builds lack FTS5 or the trigram tokenizer; scan the folders instead
+                self._index_failed = True
+                log_message(f"Media index unavailable, searching folders directly: {e}", "WARNING")
+        
         try:
-            for directory in media_dirs:
-                if not os.path.exists(directory):
-                    continue
-                
-                for root, dirs, files in os.walk(directory):
-                    for file in files:
-                        file_lower = file.lower()
-                        file_ext = os.path.splitext(file)[1].lower()
-                        
-                        if file_ext in media_extensions and search_term_lower in file_lower:
-                            full_path = os.path.join(root, file)
-                            matching_files.append({
-                                'filename': file,
-                                'path': full_path,
-                                'directory': root,
-                                'size': os.path.getsize(full_path)
-                            })
+            # Scanning is I/O bound, so slow disks and mounts overlap instead of queueing
+            results_by_dir = {}
+            with ThreadPoolExecutor(max_workers=max(1, len(media_dirs))) as executor:
+                futures = {
+                    executor.submit(find_media_files, directory, search_term_lower): directory
+                    for directory in media_dirs
+                }
+                for future in as_completed(futures):
+                    directory = futures[future]
+                    try:
+                        results_by_dir[directory] = future.result()
+                    except Exception as e:
+                        log_message(f"Skipping {directory} in media search: {e}", "WARNING")
+            
+            matching_files = [
+                item for directory in media_dirs
+                for item in results_by_dir.get(directory, ())
+            ]
             
             log_message(f"Found {len(matching_files)} local media files matching '{search_term}'")
             return matching_files
@@ -312,6 +994,120 @@ class MediaHandler:
             log_message(f"Local media search failed: {e}", "ERROR")
             return []
     
+    def _open_index(self):
+        """Open the local media index, creating it on first use"""
+        if self._index is None:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            index = sqlite3.connect(MEDIA_INDEX_FILE, check_same_thread=False)
+            index.executescript(MEDIA_INDEX_SCHEMA)
+            self._index = index
+        return self._index
+    
+    def _ensure_index(self, media_dirs):
+        """Rescan any of the folders that were never indexed or whose index is too old"""
+        with self._index_lock:
+            scanned = dict(self._open_index().execute("SELECT root, scanned_at FROM media_roots"))
+        
+        now = time.time()
+        stale_dirs = [d for d in media_dirs if now - scanned.get(d, 0) > MEDIA_INDEX_MAX_AGE]
+        if stale_dirs:
+            self.refresh_media_index(stale_dirs)
+    
+    def refresh_media_index(self, media_dirs=None):
+        """
+        Rescan local media folders and bring the search index up to date
+        Args:
+            media_dirs (list): Directories to rescan (defaults to the standard media folders)
+        Returns:
+            int: Number of files added or updated
+        """
+        if media_dirs is None:
+            media_dirs = DEFAULT_MEDIA_DIRS
+        media_dirs = collapse_media_dirs(media_dirs)
+        
+        updated = 0
+        with ThreadPoolExecutor(max_workers=max(1, len(media_dirs))) as executor:
+            futures = {executor.submit(scan_media_files, directory): directory for directory in media_dirs}
+            for future in as_completed(futures):
+                directory = futures[future]
+                try:
+                    media_files = future.result()
+                except Exception as e:
+                    log_message(f"Skipping {directory} in media index refresh: {e}", "WARNING")
+                    continue
+                updated += self._update_index(directory, media_files)
+        
+        log_message(f"Media index refreshed: {updated} files added or updated")
+        return updated
+    
+    def _update_index(self, root, media_files):
+        """
+        Replace the index entries of one folder whose files were added, changed or removed
+        Args:
+            root (str): Scanned folder
+            media_files (list): Result of scan_media_files for that folder
+        Returns:
+            int: Number of files added or updated
+        """
+        current = {item[1]: item for item in media_files}
+        
+        with self._index_lock:
+            index = self._open_index()
+            with index:
+                unchanged = set()
+                stale_rows = []
+                for rowid, path, size, mtime in index.execute(
+                    "SELECT rowid, path, size, mtime FROM media WHERE root = ?", (root,)
+                ):
+                    item = current.get(path)
+                    if item is not None and item[3:] == (size, mtime):
+                        unchanged.add(path)
+                    else:
+                        stale_rows.append((rowid,))
+                
+                fresh = [item + (root,) for path, item in current.items() if path not in unchanged]
+                index.executemany("DELETE FROM media WHERE rowid = ?", stale_rows)
+                index.executemany(
+                    "INSERT INTO media (filename, path, directory, size, mtime, root) VALUES (?, ?, ?, ?, ?, ?)",
+                    fresh
+                )
+                index.execute(
+                    "INSERT OR REPLACE INTO media_roots (root, scanned_at) VALUES (?, ?)",
+                    (root, time.time())
+                )
+        
+        return len(fresh)
+    
+    def _search_index(self, search_term_lower, media_dirs):
+        """
+        Look up media files by name in the index
+        Args:
+            search_term_lower (str): Lower-cased search term
+            media_dirs (list): Absolute directories to limit results to
+        Returns:
+            list: List of matching files
+        """
+        roots = ', '.join('?' * len(media_dirs))
+        query = f"SELECT root, filename, path, directory, size FROM media WHERE root IN ({roots})"
+        params = list(media_dirs)
+        
+        # Trigrams need at least three characters; shorter terms are filtered below
+        if len(search_term_lower) >= 3:
+            query += " AND media MATCH ?"
+            params.append('"' + search_term_lower.replace('"', '""') + '"')
+        
+        with self._index_lock:
+            rows = self._open_index().execute(query, params).fetchall()
+        
+        order = {directory: i for i, directory in enumerate(media_dirs)}
+        rows.sort(key=lambda row: (order[row[0]], row[2]))
+        
+        return [
+            {'filename': filename, 'path': path, 'directory': directory, 'size': size}
+            for _, filename, path, directory, size in rows
+            if search_term_lower in filename.lower()
+        ]
+    
     def create_playlist(self, name, items):
         """
         Create a playlist (simplified implementation)
@@ -324,14 +1120,15 @@ class MediaHandler:
         try:
             playlist = {
                 'name': name,
-                'items': items,
+                'items': list(items),
                 'created': datetime.now().isoformat(),
                 'total_items': len(items)
             }
             
-            # In a full implementation, you'd save this to a file
+            self.playlists[name] = playlist
+            self._persist('playlist', playlist)
             log_message(f"Playlist '{name}' created with {len(items)} items")
-            speak(f"Created playlist '{name}' with {len(items)} items")
+            say(f"Created playlist '{name}' with {len(items)} items")
             
             return True
             
@@ -344,14 +1141,16 @@ class MediaHandler:
         history_entry = {
             'type': media_type,
             'title': title,
-            'played_at': datetime.now().isoformat()
+            'played_at': time.time()  # Formatted only when history is read
         }
         
         self.media_history.append(history_entry)
-        
-        # Keep only recent history
-        if len(self.media_history) > 50:
-            self.media_history = self.media_history[-50:]
+        self._persist('history', history_entry)
+    
+    def _recent_history(self, limit):
+        """Get the last limit history entries, oldest first"""
+        start = max(0, len(self.media_history) - limit)
+        return list(itertools.islice(self.media_history, start, None))
     
     def get_media_history(self, limit=10):
         """
@@ -361,13 +1160,17 @@ class MediaHandler:
         Returns:
             list: Recent media history
         """
-        return self.media_history[-limit:] if self.media_history else []
+        return [
+            {**entry, 'played_at': format_timestamp(entry['played_at'])}
+            for entry in self._recent_history(limit)
+        ]
     
     def clear_media_history(self):
         """Clear media play history"""
-        self.media_history = []
+        self.media_history.clear()
+        self._persist('clear_history')
         log_message("Media history cleared")
-        speak("Media history cleared")
+        say("Media history cleared")
     
     def get_media_recommendations(self, based_on_history=True):
         """
@@ -377,35 +1180,14 @@ class MediaHandler:
         Returns:
             list: List of recommendations
         """
-        recommendations = []
-        
         if based_on_history and self.media_history:
             # Analyze history for patterns (simplified)
-            recent_types = [item['type'] for item in self.media_history[-10:]]
-            most_common_type = max(set(recent_types), key=recent_types.count)
-            
-            if most_common_type == 'youtube':
-                recommendations = [
-                    "Popular music videos",
-                    "Trending videos",
-                    "Educational content"
-                ]
-            elif most_common_type == 'spotify':
-                recommendations = [
-                    "Discover Weekly",
-                    "Release Radar",
-                    "Daily Mix"
-                ]
-        else:
-            # Generic recommendations
-            recommendations = [
-                "Popular music",
-                "Latest movies",
-                "Trending videos",
-                "Podcasts"
-            ]
+            recent_types = Counter(item['type'] for item in self._recent_history(10))
+            most_common_type = recent_types.most_common(1)[0][0]
+            return list(HISTORY_RECOMMENDATIONS.get(most_common_type, ()))
         
-        return recommendations
+        # Generic recommendations
+        return list(GENERIC_RECOMMENDATIONS)
     
     def open_media_app(self, app_name):
         """
@@ -415,58 +1197,31 @@ class MediaHandler:
         Returns:
             bool: True if successful, False otherwise
         """
-        app_commands = {
-            'spotify': {
-                'windows': 'spotify.exe',
-                'darwin': 'open -a Spotify',
-                'linux': 'spotify'
-            },
-            'youtube': {
-                'windows': 'start https://youtube.com',
-                'darwin': 'open https://youtube.com',
-                'linux': 'xdg-open https://youtube.com'
-            },
-            'vlc': {
-                'windows': 'vlc.exe',
-                'darwin': 'open -a VLC',
-                'linux': 'vlc'
-            }
-        }
-        
         app_name_lower = app_name.lower()
         
-        if app_name_lower not in app_commands:
-            speak(f"I don't know how to open {app_name}")
+        if app_name_lower not in PLATFORM_APP_COMMANDS:
+            say(f"I don't know how to open {app_name}")
             return False
         
         try:
-            import platform
-            system = platform.system().lower()
-            if system == 'darwin':
-                system = 'darwin'
-            elif system == 'linux':
-                system = 'linux'
-            else:
-                system = 'windows'
-            
-            command = app_commands[app_name_lower].get(system)
+            command = PLATFORM_APP_COMMANDS[app_name_lower]
             
             if command:
-                if system == 'windows' and 'start ' in command:
-                    subprocess.run(command, shell=True)
-                else:
-                    subprocess.run(command.split())
+                args, use_shell = command
+                if not use_shell:
+                    args = [resolve_command(args[0]), *args[1:]]
+                subprocess.Popen(args, shell=use_shell, **DETACHED_SPAWN_KWARGS)
                 
                 log_message(f"Opened {app_name}")
-                speak(f"Opening {app_name}")
+                say(f"Opening {app_name}")
                 return True
             else:
-                speak(f"Cannot open {app_name} on this system")
+                say(f"Cannot open {app_name} on this system")
                 return False
                 
         except Exception as e:
             log_message(f"Failed to open {app_name}: {e}", "ERROR")
-            speak(f"Sorry, I couldn't open {app_name}")
+            say(f"Sorry, I couldn't open {app_name}")
             return False
 
 # Create global media handler instance
@@ -481,6 +1236,10 @@ def play_spotify(search_query):
     """Play Spotify track"""
     return media_handler.play_spotify_track(search_query)
 
+def play_spotify_tracks(search_queries):
+    """Look up several Spotify tracks and play the first"""
+    return media_handler.play_spotify_tracks(search_queries)
+
 def play_local_media(file_path):
     """Play local media file"""
     return media_handler.play_local_media(file_path)
@@ -509,5 +1268,13 @@ def open_media_app(app_name):
     """Open media application"""
     return media_handler.open_media_app(app_name)
 
+def clear_search_cache():
+    """Forget cached YouTube/Spotify lookups"""
+    return media_handler.clear_search_cache()
+
+def refresh_media_index(media_dirs=None):
+    """Rescan local media folders into the search index"""
+    return media_handler.refresh_media_index(media_dirs)
+
 # Log successful module initialization
 log_message("Media module initialized successfully")
\ No newline at end of file
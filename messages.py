@@ -1,17 +1,204 @@
 # messages.py - Messaging integration for WhatsApp, Telegram, and Email
 
-import pywhatkit as pwk
-import yagmail
-import telebot
+import bisect
+import heapq
+import itertools
+import random
+import re
+import smtplib
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from utils import log_message, speak, retry_operation, is_valid_email, is_valid_phone
+from functools import lru_cache
+from utils import log_message, speak, is_valid_email, is_valid_phone
 from config import *
 
+# Messaging libraries are imported on first use: pywhatkit pulls in pyautogui and Pillow
+# and checks the network when loaded, and each service is only needed if it's configured
+_pywhatkit = None
+_yagmail = None
+_telebot = None
+
+def _get_pywhatkit():
+    global _pywhatkit
+    if _pywhatkit is None:
+        import pywhatkit as _pywhatkit
+    return _pywhatkit
+
+def _get_yagmail():
+    global _yagmail
+    if _yagmail is None:
+        import yagmail as _yagmail
+    return _yagmail
+
+def _get_telebot():
+    global _telebot
+    if _telebot is None:
+        import telebot as _telebot
+    return _telebot
+
+BULK_SEND_WORKERS = 16  # Most sends in flight at once during send_bulk_messages
+
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096  # Longest text Telegram accepts in one message
+
+# Everything except digits and "+" is formatting to strip from phone numbers
+PHONE_CLEAN_PATTERN = re.compile(r'[^\d+]')
+
+# Placeholder contacts database - in a real implementation, you'd integrate with contacts
+CONTACTS = {
+    'mom': {'phone': '+1234567890', 'email': 'mom@example.com'},
+    'dad': {'phone': '+1234567891', 'email': 'dad@example.com'},
+    'work': {'email': 'work@company.com'},
+    'boss': {'email': 'boss@company.com', 'telegram': '123456789'}
+}
+
+# Every suffix of every lower-cased contact name, sorted, as (suffix, contact position).
+# A substring of a name is a prefix of one of its suffixes, so bisect finds all matches.
+CONTACT_NAMES = list(CONTACTS)
+CONTACT_SUFFIXES = sorted(
+    (name.lower()[start:], position)
+    for position, name in enumerate(CONTACT_NAMES)
+    for start in range(len(name))
+)
+
+@lru_cache(maxsize=4096)
+def detect_message_type(recipient):
+    """
+    Guess the channel for a recipient from its format
+    Args:
+        recipient (str): Recipient identifier
+    Returns:
+        str: 'email', 'whatsapp', or 'telegram'
+    """
+    # Every email has an "@", so phone numbers and chat IDs skip the email pattern
+    if '@' in recipient and is_valid_email(recipient):
+        return 'email'
+    elif is_valid_phone(recipient):
+        return 'whatsapp'
+    else:
+        return 'telegram'  # Assume telegram chat ID
+
+def transient_delay(error):
+    """
+    Decide whether a failed send is worth retrying
+    Args:
+        error (Exception): What the send raised
+    Returns:
+        float: Seconds the server asked us to wait (0 if it didn't say), or None if retrying won't help
+    """
+    # Only a loaded telebot can have raised one of its own errors
+    if _telebot is not None and isinstance(error, _telebot.apihelper.ApiTelegramException):
+        if error.error_code == 429:
+            parameters = (error.result_json or {}).get('parameters') or {}
+            return float(parameters.get('retry_after', 0))
+        return 0.0 if error.error_code >= 500 else None
+    
+    # smtplib errors are OSErrors too, so the permanent ones are sorted out first
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 0.0 if 400 <= error.smtp_code < 500 else None
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return 0.0
+    if isinstance(error, smtplib.SMTPException):
+        return None
+    if isinstance(error, OSError):
+        return 0.0  # Connection reset, timeout, DNS hiccup
+    return None
+
+def retry_send(operation, max_retries=MAX_RETRIES):
+    """
+    Run a send, retrying transient failures with jittered exponential backoff
+    Args:
+        operation: Function performing the send
+        max_retries (int): Retries after the first attempt
+    Returns:
+        The operation's result, or None if it failed
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return operation()
+        except Exception as e:
+            server_delay = transient_delay(e)
+            if server_delay is None:
+                log_message(f"Send failed and won't be retried: {e}", "ERROR")
+                return None
+            if attempt == max_retries:
+                log_message(f"Send failed after {max_retries} retries: {e}", "ERROR")
+                return None
+            
+            # Jitter spreads out retries from parallel bulk sends that failed together
+            wait_time = server_delay or min(MESSAGE_RETRY_MAX_WAIT, RETRY_DELAY * 2 ** attempt)
+            wait_time += random.uniform(0, RETRY_DELAY)
+            log_message(f"Send attempt {attempt + 1} failed: {e}. Retrying in {wait_time:.1f} seconds...")
+            time.sleep(wait_time)
+
+def pack_messages(messages, limit=TELEGRAM_MAX_MESSAGE_LENGTH):
+    """
+    Join consecutive messages with newlines into as few chunks as fit the limit
+    Args:
+        messages (list): Message texts, in order
+        limit (int): Longest chunk allowed
+    Returns:
+        list: Chunks, each at most limit characters
+    """
+    chunks = []
+    current = ''
+    for text in messages:
+        # A single message over the limit is split on its own
+        pieces = [text[i:i + limit] for i in range(0, len(text), limit)] or ['']
+        for piece in pieces:
+            if current and len(current) + 1 + len(piece) <= limit:
+                current += '\n' + piece
+            else:
+                if current:
+                    chunks.append(current)
+                current = piece
+    
+    if current:
+        chunks.append(current)
+    return chunks
+
+class TokenBucket:
+    """Paces sends to a sustained rate while letting short bursts through"""
+    def __init__(self, capacity, refill_rate):
+        self.capacity = capacity
+        self.refill_rate = refill_rate  # Tokens added per second
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+    
+    def acquire(self):
+        """Block until one send fits in the budget"""
+        with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.refill_rate)
+
 class MessageHandler:
     def __init__(self):
         self.email_client = None
         self.telegram_bot = None
+        self._email_lock = threading.Lock()  # smtplib connections can't be shared between threads
+        self._email_keepalive = None
+        self._tg_last_update_id = 0  # Updates up to this id have been read
+        
+        # Scheduled messages wait in a heap ordered by send time, served by one thread
+        self._sched_heap = []  # (send_at, seq, message_type, recipient, message, subject)
+        self._sched_cv = threading.Condition()
+        self._sched_seq = itertools.count()  # Tie-breaker so equal times keep their order
+        self._scheduler = None
+        self._buckets = {
+            message_type: TokenBucket(capacity, refill_rate)
+            for message_type, (capacity, refill_rate) in MESSAGE_RATE_LIMITS.items()
+        }
         self.initialize_services()
     
     def initialize_services(self):
@@ -19,7 +206,8 @@ class MessageHandler:
         # Initialize email
         if EMAIL_ADDRESS and EMAIL_PASSWORD and EMAIL_ADDRESS != "your-email@gmail.com":
             try:
-                self.email_client = yagmail.SMTP(EMAIL_ADDRESS, EMAIL_PASSWORD)
+                self.email_client = _get_yagmail().SMTP(EMAIL_ADDRESS, EMAIL_PASSWORD)
+                self._start_email_keepalive()
                 log_message("Email service initialized successfully")
             except Exception as e:
                 log_message(f"Failed to initialize email service: {e}", "ERROR")
@@ -27,11 +215,42 @@ class MessageHandler:
         # Initialize Telegram bot
         if TELEGRAM_BOT_TOKEN and TELEGRAM_BOT_TOKEN != "your-telegram-bot-token":
             try:
-                self.telegram_bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN)
+                self.telegram_bot = _get_telebot().TeleBot(TELEGRAM_BOT_TOKEN)
+                self._share_telegram_session()
                 log_message("Telegram bot initialized successfully")
             except Exception as e:
                 log_message(f"Failed to initialize Telegram bot: {e}", "ERROR")
     
+    def _share_telegram_session(self):
+        """Route telebot's API calls through one pooled keep-alive session for all threads"""
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        # telebot otherwise opens a separate session, and TLS connection, per calling thread
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount('https://', adapter)
+        _get_telebot().apihelper.CUSTOM_REQUEST_SENDER = session.request
+    
+    def _start_email_keepalive(self):
+        """Start pinging the SMTP server so the reused connection isn't closed while idle"""
+        if self._email_keepalive is None:
+            self._email_keepalive = threading.Thread(target=self._email_keepalive_loop, name="smtp-keepalive", daemon=True)
+            self._email_keepalive.start()
+    
+    def _email_keepalive_loop(self):
+        while True:
+            time.sleep(EMAIL_KEEPALIVE_SECONDS)
+            with self._email_lock:
+                # yagmail connects on the first send and reconnects by itself after a failure
+                smtp = getattr(self.email_client, 'smtp', None)
+                if smtp is None or getattr(self.email_client, 'is_closed', True):
+                    continue
+                try:
+                    smtp.noop()
+                except Exception as e:
+                    log_message(f"SMTP keepalive failed: {e}", "DEBUG")
+    
     def send_whatsapp_message(self, phone_number, message, send_immediately=False):
         """
         Send WhatsApp message using pywhatkit
@@ -49,12 +268,11 @@ class MessageHandler:
                 return False
             
             # Clean phone number (remove non-digits except +)
-            import re
-            cleaned_number = re.sub(r'[^\d+]', '', phone_number)
+            cleaned_number = PHONE_CLEAN_PATTERN.sub('', phone_number)
             
             if send_immediately:
                 # Send immediately (opens WhatsApp Web)
-                pwk.sendwhatmsg_instantly(cleaned_number, message)
+                _get_pywhatkit().sendwhatmsg_instantly(cleaned_number, message)
                 log_message(f"WhatsApp message sent immediately to {cleaned_number}")
             else:
                 # Schedule for next minute
@@ -63,7 +281,7 @@ class MessageHandler:
                 hour = send_time.hour
                 minute = send_time.minute
                 
-                pwk.sendwhatmsg(cleaned_number, message, hour, minute)
+                _get_pywhatkit().sendwhatmsg(cleaned_number, message, hour, minute)
                 log_message(f"WhatsApp message scheduled for {hour}:{minute:02d} to {cleaned_number}")
             
             speak("WhatsApp message sent successfully.")
@@ -95,16 +313,17 @@ class MessageHandler:
             return False
         
         def send_operation():
-            self.email_client.send(
-                to=recipient,
-                subject=subject,
-                contents=body,
-                attachments=attachments or []
-            )
+            with self._email_lock:
+                self.email_client.send(
+                    to=recipient,
+                    subject=subject,
+                    contents=body,
+                    attachments=attachments or []
+                )
             return True
         
         try:
-            success = retry_operation(send_operation)
+            success = retry_send(send_operation)
             
             if success:
                 log_message(f"Email sent to {recipient}: {subject}")
@@ -137,7 +356,7 @@ class MessageHandler:
             return True
         
         try:
-            success = retry_operation(send_operation)
+            success = retry_send(send_operation)
             
             if success:
                 log_message(f"Telegram message sent to {chat_id}")
@@ -152,11 +371,44 @@ class MessageHandler:
             speak("Failed to send Telegram message.")
             return False
     
-    def get_telegram_updates(self, limit=10):
+    def send_telegram_bulk(self, chat_id, messages):
         """
-        Get recent Telegram messages
+        Send several Telegram messages to one chat, packed into as few API calls as fit
         Args:
-            limit (int): Number of recent messages to retrieve
+            chat_id (str): Telegram chat ID
+            messages (list): Messages to send, in order
+        Returns:
+            bool: True if every chunk was sent, False otherwise
+        """
+        if not self.telegram_bot:
+            speak("Telegram bot is not configured.")
+            return False
+        
+        chunks = pack_messages(messages)
+        sent = 0
+        
+        try:
+            for chunk in chunks:
+                if not retry_send(lambda: self.telegram_bot.send_message(chat_id, chunk) or True):
+                    break
+                sent += 1
+        except Exception as e:
+            log_message(f"Failed to send Telegram messages: {e}", "ERROR")
+        
+        log_message(f"Sent {len(messages)} Telegram messages to {chat_id} in {sent}/{len(chunks)} requests")
+        if sent < len(chunks):
+            speak("Failed to send all Telegram messages.")
+            return False
+        
+        speak("Telegram messages sent successfully.")
+        return True
+    
+    def get_telegram_updates(self, limit=10, poll_timeout=TELEGRAM_POLL_TIMEOUT):
+        """
+        Get Telegram messages received since the last check
+        Args:
+            limit (int): Maximum number of messages to retrieve
+            poll_timeout (int): Seconds to wait for a message if none are pending
         Returns:
             list: List of message objects or empty list if failed
         """
@@ -164,18 +416,24 @@ class MessageHandler:
             return []
         
         try:
-            updates = self.telegram_bot.get_updates(limit=limit)
-            messages = []
+            # The offset tells Telegram everything before it has been seen, so only new updates come back
+            updates = self.telegram_bot.get_updates(
+                offset=self._tg_last_update_id + 1,
+                limit=limit,
+                long_polling_timeout=poll_timeout
+            )
+            if updates:
+                self._tg_last_update_id = max(update.update_id for update in updates)
             
-            for update in updates:
-                if update.message:
-                    msg = {
-                        'chat_id': update.message.chat.id,
-                        'from_user': update.message.from_user.first_name,
-                        'text': update.message.text,
-                        'date': update.message.date
-                    }
-                    messages.append(msg)
+            messages = [
+                {
+                    'chat_id': update.message.chat.id,
+                    'from_user': update.message.from_user.first_name,
+                    'text': update.message.text,
+                    'date': update.message.date
+                }
+                for update in updates if update.message
+            ]
             
             log_message(f"Retrieved {len(messages)} Telegram messages")
             return messages
@@ -184,6 +442,21 @@ class MessageHandler:
             log_message(f"Failed to get Telegram updates: {e}", "ERROR")
             return []
     
+    def resolve_message_type(self, message_type, recipient):
+        """
+        Pick the channel for a recipient when the type is 'auto'
+        Args:
+            message_type (str): 'email', 'whatsapp', 'telegram', or 'auto'
+            recipient (str): Recipient identifier
+        Returns:
+            str: Concrete message type
+        """
+        if message_type != 'auto':
+            return message_type
+        
+        # Auto-detect based on recipient format
+        return detect_message_type(recipient)
+    
     def send_message_by_type(self, message_type, recipient, message, subject=None):
         """
         Send message based on type (auto-detect or specified)
@@ -195,14 +468,7 @@ class MessageHandler:
         Returns:
             bool: True if successful, False otherwise
         """
-        if message_type == 'auto':
-            # Auto-detect based on recipient format
-            if is_valid_email(recipient):
-                message_type = 'email'
-            elif is_valid_phone(recipient):
-                message_type = 'whatsapp'
-            else:
-                message_type = 'telegram'  # Assume telegram chat ID
+        message_type = self.resolve_message_type(message_type, recipient)
         
         if message_type == 'email':
             subject = subject or "Message from Sarah"
@@ -228,22 +494,24 @@ class MessageHandler:
             schedule_time (datetime): When to send the message
             subject (str): Subject (for email)
         Returns:
-            bool: True if scheduled successfully
+            bool: True if scheduled successfully, False if it failed or the scheduler is full
         """
-        # This is a simplified implementation
-        # In a full implementation, you'd want to use a proper scheduler
-        
-        import threading
-        
-        def delayed_send():
-            delay = (schedule_time - datetime.now()).total_seconds()
-            if delay > 0:
-                time.sleep(delay)
-                self.send_message_by_type(message_type, recipient, message, subject)
-        
         try:
-            thread = threading.Thread(target=delayed_send, daemon=True)
-            thread.start()
+            with self._sched_cv:
+                if len(self._sched_heap) >= MAX_SCHEDULED_MESSAGES:
+                    log_message(f"Scheduler full ({MAX_SCHEDULED_MESSAGES} pending), message to {recipient} refused; retry later", "WARNING")
+                    speak("Too many messages are already scheduled. Please try again later.")
+                    return False
+                
+                if self._scheduler is None:
+                    self._scheduler = threading.Thread(target=self._run_scheduler, name="message-scheduler", daemon=True)
+                    self._scheduler.start()
+                
+                heapq.heappush(self._sched_heap, (
+                    schedule_time.timestamp(), next(self._sched_seq),
+                    message_type, recipient, message, subject
+                ))
+                self._sched_cv.notify()  # The new message may be due before the one being waited on
             
             log_message(f"Message scheduled for {schedule_time}")
             speak(f"Message scheduled to be sent at {schedule_time.strftime('%I:%M %p')}")
@@ -254,6 +522,28 @@ class MessageHandler:
             speak("Failed to schedule message.")
             return False
     
+    def _run_scheduler(self):
+        """Send scheduled messages as they fall due (runs on the scheduler thread)"""
+        while True:
+            with self._sched_cv:
+                while True:
+                    if not self._sched_heap:
+                        self._sched_cv.wait()
+                        continue
+                    
+                    delay = self._sched_heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self._sched_cv.wait(timeout=delay)
+                
+                _, _, message_type, recipient, message, subject = heapq.heappop(self._sched_heap)
+            
+            # Send without holding the lock so new messages can be scheduled meanwhile
+            try:
+                self.send_message_by_type(message_type, recipient, message, subject)
+            except Exception as e:
+                log_message(f"Scheduled message to {recipient} failed: {e}", "ERROR")
+    
     def send_bulk_messages(self, message_type, recipients, message, subject=None):
         """
         Send message to multiple recipients
@@ -265,23 +555,66 @@ class MessageHandler:
         Returns:
             dict: Results for each recipient
         """
-        results = {}
-        successful = 0
+        if not recipients:
+            return {}
         
+        # WhatsApp sends type into the browser, so they go one at a time on a single worker
+        whatsapp_recipients = []
+        other_recipients = []
         for recipient in recipients:
-            success = self.send_message_by_type(message_type, recipient, message, subject)
-            results[recipient] = success
-            if success:
-                successful += 1
+            recipient_type = self.resolve_message_type(message_type, recipient)
+            if recipient_type == 'whatsapp':
+                whatsapp_recipients.append(recipient)
+            else:
+                other_recipients.append((recipient_type, recipient))
+        
+        sent = {}
+        with ThreadPoolExecutor(max_workers=min(BULK_SEND_WORKERS, len(recipients))) as executor:
+            futures = {
+                executor.submit(self._send_paced, recipient_type, recipient, message, subject): [recipient]
+                for recipient_type, recipient in other_recipients
+            }
+            if whatsapp_recipients:
+                futures[executor.submit(self._send_serially, 'whatsapp', whatsapp_recipients, message)] = whatsapp_recipients
             
-            # Add delay between messages to avoid rate limiting
-            time.sleep(1)
+            for future in as_completed(futures):
+                try:
+                    sent.update(future.result())
+                except Exception as e:
+                    log_message(f"Bulk send failed for {futures[future]}: {e}", "ERROR")
+        
+        results = {recipient: sent.get(recipient, False) for recipient in recipients}
+        successful = sum(results.values())
         
         log_message(f"Bulk message sent: {successful}/{len(recipients)} successful")
         speak(f"Sent {successful} out of {len(recipients)} messages successfully.")
         
         return results
     
+    def _send_paced(self, message_type, recipient, message, subject=None):
+        """
+        Send one message once its channel's rate limit allows
+        Returns:
+            dict: {recipient: success}
+        """
+        # Bursts go out without waiting; beyond that, sends wait for the bucket to refill
+        bucket = self._buckets.get(message_type)
+        if bucket:
+            bucket.acquire()
+        
+        return {recipient: self.send_message_by_type(message_type, recipient, message, subject)}
+    
+    def _send_serially(self, message_type, recipients, message, subject=None):
+        """
+        Send to several recipients one after another on the calling thread
+        Returns:
+            dict: {recipient: success}
+        """
+        results = {}
+        for recipient in recipients:
+            results.update(self._send_paced(message_type, recipient, message, subject))
+        return results
+    
     def create_email_template(self, template_name, subject_template, body_template):
         """
         Create an email template (simplified version)
@@ -307,25 +640,18 @@ class MessageHandler:
         Get contact suggestions based on partial name
         This is a placeholder - in a real implementation, you'd integrate with contacts
         """
-        # Placeholder contacts database
-        contacts = {
-            'mom': {'phone': '+1234567890', 'email': 'mom@example.com'},
-            'dad': {'phone': '+1234567891', 'email': 'dad@example.com'},
-            'work': {'email': 'work@company.com'},
-            'boss': {'email': 'boss@company.com', 'telegram': '123456789'}
-        }
-        
-        suggestions = []
         partial_name = partial_name.lower()
         
-        for name, contact_info in contacts.items():
-            if partial_name in name.lower():
-                suggestions.append({
-                    'name': name,
-                    'contact_info': contact_info
-                })
+        matches = set()
+        index = bisect.bisect_left(CONTACT_SUFFIXES, (partial_name,))
+        while index < len(CONTACT_SUFFIXES) and CONTACT_SUFFIXES[index][0].startswith(partial_name):
+            matches.add(CONTACT_SUFFIXES[index][1])
+            index += 1
         
-        return suggestions
+        return [
+            {'name': CONTACT_NAMES[position], 'contact_info': dict(CONTACTS[CONTACT_NAMES[position]])}
+            for position in sorted(matches)
+        ]
     
     def test_services(self):
         """Test all messaging services"""
@@ -376,9 +702,13 @@ def send_message(message_type, recipient, message, subject=None):
     """Send message by type"""
     return message_handler.send_message_by_type(message_type, recipient, message, subject)
 
-def get_telegram_messages(limit=10):
-    """Get recent Telegram messages"""
-    return message_handler.get_telegram_updates(limit)
+def send_telegram_bulk(chat_id, messages):
+    """Send several Telegram messages to one chat"""
+    return message_handler.send_telegram_bulk(chat_id, messages)
+
+def get_telegram_messages(limit=10, poll_timeout=TELEGRAM_POLL_TIMEOUT):
+    """Get Telegram messages received since the last check"""
+    return message_handler.get_telegram_updates(limit, poll_timeout)
 
 def schedule_message(message_type, recipient, message, schedule_time, subject=None):
     """Schedule a message"""
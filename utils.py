@@ -1,12 +1,21 @@
 # utils.py - Utility functions for Sarah AI Assistant
 
+import atexit
+import io
 import logging
+import logging.handlers
 import os
+import queue
 import random
+import re
+import tempfile
+import threading
 import time
+import wave
 import speech_recognition as sr
 import pyttsx3
 from datetime import datetime
+from functools import lru_cache
 from config import *
 
 # -----------------------
@@ -17,12 +26,74 @@ from config import *
 _engine = pyttsx3.init()
 _engine.setProperty("rate", 180)   # Speaking speed
 _engine.setProperty("volume", 1.0) # Volume (0.0 - 1.0)
+_engine_lock = threading.Lock()  # pyttsx3 engines are not safe to drive from several threads
+_pyaudio = None
 
-def speak(text: str):
-    """Make Sarah speak out loud and log the action"""
-    log_message(f"Speaking: {text}", "INFO")
-    _engine.say(text)
-    _engine.runAndWait()
+@lru_cache(maxsize=32)
+def _synth(text):
+    """Render text to WAV bytes once; repeated fixed phrases replay the cached audio"""
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        with _engine_lock:
+            _engine.save_to_file(text, path)
+            _engine.runAndWait()
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.unlink(path)
+
+def _play_wav(wav_bytes):
+    """Play WAV bytes on the default output device"""
+    global _pyaudio
+    if _pyaudio is None:
+        import pyaudio
+        _pyaudio = pyaudio.PyAudio()
+    
+    with wave.open(io.BytesIO(wav_bytes)) as wav:
+        stream = _pyaudio.open(
+            format=_pyaudio.get_format_from_width(wav.getsampwidth()),
+            channels=wav.getnchannels(),
+            rate=wav.getframerate(),
+            output=True
+        )
+        try:
+            stream.write(wav.readframes(wav.getnframes()))
+        finally:
+            stream.stop_stream()
+            stream.close()
+
+def prewarm_speech(*texts):
+    """Synthesize fixed phrases ahead of time so speak(..., cached=True) plays them instantly"""
+    for text in texts:
+        try:
+            _synth(text)
+        except Exception as e:
+            log_message("Could not pre-render %r: %s", "WARNING", text, e)
+
+def clear_speech_cache():
+    """Drop pre-rendered phrases; call after changing the voice, rate or volume"""
+    _synth.cache_clear()
+
+def speak(text: str, cached=False):
+    """
+    Make Sarah speak out loud and log the action
+    Args:
+        text (str): What to say
+        cached (bool): Replay synthesized audio for fixed phrases instead of re-synthesizing
+    """
+    log_message("Speaking: %s", "INFO", text)
+    
+    if cached:
+        try:
+            _play_wav(_synth(text))
+            return
+        except Exception as e:
+            log_message("Cached speech failed, falling back to live TTS: %s", "DEBUG", e)
+    
+    with _engine_lock:
+        _engine.say(text)
+        _engine.runAndWait()
 
 def listen(timeout=5, phrase_time_limit=10):
     """Listen from microphone and return recognized text"""
@@ -32,7 +103,7 @@ def listen(timeout=5, phrase_time_limit=10):
         try:
             audio = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
             text = recognizer.recognize_google(audio)
-            log_message(f"Recognized speech: {text}", "INFO")
+            log_message("Recognized speech: %s", "INFO", text)
             return text
         except sr.WaitTimeoutError:
             log_message("Listening timed out", "WARNING")
@@ -69,35 +140,61 @@ def setup_directories():
             os.makedirs(directory)
             log_message(f"Created directory: {directory}")
 
+_log_listener = None
+
 def setup_logging():
     """Setup logging configuration"""
+    global _log_listener
+    if _log_listener is not None:
+        return
+    
     setup_directories()
     
     log_filename = os.path.join(LOGS_DIR, f"sarah_{datetime.now().strftime('%Y%m%d')}.log")
     
-    logging.basicConfig(
-        level=getattr(logging, LOG_LEVEL.upper()),
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_filename),
-            logging.StreamHandler() if DEBUG_MODE else logging.NullHandler()
-        ]
-    )
-
-def log_message(message, level="INFO"):
-    """Log a message with the specified level"""
-    logger = logging.getLogger(__name__)
-    
-    if level.upper() == "DEBUG":
-        logger.debug(message)
-    elif level.upper() == "INFO":
-        logger.info(message)
-    elif level.upper() == "WARNING":
-        logger.warning(message)
-    elif level.upper() == "ERROR":
-        logger.error(message)
-    elif level.upper() == "CRITICAL":
-        logger.critical(message)
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(log_filename)
+    console_handler = logging.StreamHandler() if DEBUG_MODE else logging.NullHandler()
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+    
+    # Callers only enqueue records; a background listener does the file/console I/O
+    log_queue = queue.Queue(-1)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, LOG_LEVEL.upper()))
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    _log_listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+def flush_logging():
+    """Write out every queued log record"""
+    if _log_listener is None:
+        return
+    
+    _log_listener.queue.join()  # The file handler flushes each record it writes
+
+_logger = logging.getLogger(__name__)
+_LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL
+}
+
+def log_message(message, level="INFO", *args):
+    """
+    Log a message with the specified level
+    Args:
+        message (str): Message, optionally with %-style placeholders
+        level (str): Level name
+        *args: Values for the placeholders, only formatted if the record is emitted
+    """
+    levelno = _LOG_LEVELS.get(level.upper())
+    if levelno is not None:
+        _logger.log(levelno, message, *args)
 
 def retry_operation(func, max_retries=MAX_RETRIES, delay=RETRY_DELAY):
     """Retry an operation with exponential backoff"""
@@ -172,16 +269,16 @@ def format_file_size(size_bytes):
     s = round(size_bytes / p, 2)
     return f"{s} {size_names[i]}"
 
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+NON_DIGIT_PATTERN = re.compile(r'\D')
+
 def is_valid_email(email):
     """Basic email validation"""
-    import re
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_PATTERN.match(email) is not None
 
 def is_valid_phone(phone):
     """Basic phone number validation"""
-    import re
-    digits = re.sub(r'\D', '', phone)
+    digits = NON_DIGIT_PATTERN.sub('', phone)
     return 10 <= len(digits) <= 15
 
 def normalize_text(text):
@@ -6,6 +6,9 @@ import time
 from utils import speak, log_message, retry_operation, normalize_text
 from config import *
 
+# Phrases that end conversation mode
+EXIT_COMMANDS = ('stop', 'exit', 'quit', 'goodbye', 'bye')
+
 class VoiceHandler:
     def __init__(self):
         self.recognizer = sr.Recognizer()
@@ -31,8 +34,11 @@ class VoiceHandler:
         """
         Continuously listen for wake words
         Args:
-            callback: Function to call when wake word is detected
+            callback: Function to call when wake word is detected; returning
+                False rejects the detection and keeps listening
         """
+        self.is_wake_word_active = True  # Re-enable after a shutdown/restart
+        
         def listen_loop():
             while self.is_wake_word_active:
                 try:
@@ -41,7 +47,7 @@ class VoiceHandler:
                         audio = self.recognizer.listen(
                             source, 
                             timeout=WAKE_WORD_TIMEOUT,
-                            phrase_time_limit=2
+                            phrase_time_limit=WAKE_BUFFER_SECONDS
                         )
                     
                     # Recognize speech
@@ -50,27 +56,27 @@ class VoiceHandler:
                         language=RECOGNITION_LANGUAGE
                     ).lower()
                     
-                    log_message(f"Heard: {text}")
+                    log_message("Heard: %s", "INFO", text)
                     
                     # Check for wake words
-                    for wake_word in WAKE_WORDS:
-                        if wake_word.lower() in text:
-                            log_message(f"Wake word detected: {wake_word}")
-                            self.wake_word_detected = True
-                            
-                            if callback:
-                                callback()
-                            return
+                    match = WAKE_WORD_PATTERN.search(text)
+                    if match:
+                        log_message("Wake word detected: %s", "INFO", match.group(0))
+                        if callback and callback() is False:
+                            continue
+                        
+                        self.wake_word_detected = True
+                        return
                 
                 except sr.WaitTimeoutError:
                     continue  # Normal timeout, keep listening
                 except sr.UnknownValueError:
                     continue  # Couldn't understand audio
                 except sr.RequestError as e:
-                    log_message(f"Speech recognition service error: {e}", "ERROR")
+                    log_message("Speech recognition service error: %s", "ERROR", e)
                     time.sleep(1)
                 except Exception as e:
-                    log_message(f"Unexpected error in wake word detection: {e}", "ERROR")
+                    log_message("Unexpected error in wake word detection: %s", "ERROR", e)
                     time.sleep(1)
         
         # Start listening in a separate thread
@@ -104,7 +110,7 @@ class VoiceHandler:
                 language=RECOGNITION_LANGUAGE
             )
             
-            log_message(f"Command recognized: {command}")
+            log_message("Command recognized: %s", "INFO", command)
             return command.lower()
         
         try:
@@ -126,11 +132,14 @@ class VoiceHandler:
             speak("I'm having trouble with speech recognition right now.")
             return None
     
-    def start_conversation_mode(self, command_handler):
+    def start_conversation_mode(self, command_handler, done_evt=None):
         """
         Start continuous conversation mode
         Args:
             command_handler: Function to handle recognized commands
+            done_evt (threading.Event): Set when conversation mode ends
+        Returns:
+            threading.Thread: The conversation worker, joinable by the caller
         """
         self.is_listening = True
         log_message("Starting conversation mode")
@@ -141,14 +150,13 @@ class VoiceHandler:
             
             while self.is_listening:
                 try:
-                    command = self.listen_for_command(timeout=10)
+                    command = self.listen_for_command(timeout=COMMAND_BUFFER_SECONDS)
                     
                     if command:
                         consecutive_failures = 0  # Reset failure count
                         
                         # Check for exit commands
-                        exit_commands = ['stop', 'exit', 'quit', 'goodbye', 'bye']
-                        if any(exit_cmd in command for exit_cmd in exit_commands):
+                        if any(exit_cmd in command for exit_cmd in EXIT_COMMANDS):
                             speak("Goodbye!")
                             self.stop_listening()
                             break
@@ -171,8 +179,16 @@ class VoiceHandler:
                         self.stop_listening()
                         break
         
-        conversation_thread = threading.Thread(target=conversation_loop, daemon=True)
+        def run_conversation():
+            try:
+                conversation_loop()
+            finally:
+                if done_evt is not None:
+                    done_evt.set()
+        
+        conversation_thread = threading.Thread(target=run_conversation, daemon=True)
         conversation_thread.start()
+        return conversation_thread
     
     def stop_listening(self):
         """Stop continuous listening mode"""
@@ -288,9 +304,9 @@ def listen_for_command(timeout=None):
     """Listen for a voice command"""
     return voice_handler.listen_for_command(timeout)
 
-def start_conversation_mode(command_handler):
+def start_conversation_mode(command_handler, done_evt=None):
     """Start continuous conversation mode"""
-    return voice_handler.start_conversation_mode(command_handler)
+    return voice_handler.start_conversation_mode(command_handler, done_evt)
 
 def stop_listening():
     """Stop all listening modes"""
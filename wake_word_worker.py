@@ -0,0 +1,123 @@
+# wake_word_worker.py - Wake word detection process for Sarah AI Assistant
+
+import logging
+import multiprocessing
+import threading
+import speech_recognition as sr
+from config import WAKE_WORD_PATTERN, WAKE_WORD_TIMEOUT, WAKE_BUFFER_SECONDS, RECOGNITION_LANGUAGE
+
+# The worker is started with "spawn": the child re-imports this module and
+# also the parent's __main__ (main.py, and through it utils, which creates a
+# TTS engine), so the child repeats main.py's import-time work on top of
+# whatever this module imports. Keep this module's own imports light.
+logger = logging.getLogger(__name__)
+
+def run_wake_word_worker(detected, stop, paused):
+    """
+    Listen for wake words until told to stop (runs in the worker process)
+    Args:
+        detected (multiprocessing.Event): Set each time a wake word is heard
+        stop (multiprocessing.Event): Set by the parent to end the worker
+        paused (multiprocessing.Event): Set by the parent while it uses the microphone itself
+    """
+    recognizer = sr.Recognizer()
+    microphone = sr.Microphone()
+    
+    try:
+        with microphone as source:
+            recognizer.adjust_for_ambient_noise(source, duration=2)
+    except Exception as e:
+        logger.error("Wake word worker calibration failed: %s", e)
+    
+    while not stop.is_set():
+        if paused.is_set():
+            stop.wait(0.1)  # Leave the microphone to the parent's command capture
+            continue
+        
+        try:
+            with microphone as source:
+                audio = recognizer.listen(source, timeout=WAKE_WORD_TIMEOUT, phrase_time_limit=WAKE_BUFFER_SECONDS)
+            
+            text = recognizer.recognize_google(audio, language=RECOGNITION_LANGUAGE).lower()
+            if WAKE_WORD_PATTERN.search(text):
+                detected.set()
+        
+        except (sr.WaitTimeoutError, sr.UnknownValueError):
+            continue  # Silence or unintelligible audio, keep listening
+        except sr.RequestError as e:
+            logger.error("Speech recognition service error: %s", e)
+            stop.wait(1)
+        except Exception as e:
+            logger.error("Unexpected error in wake word worker: %s", e)
+            stop.wait(1)
+
+class WakeWordProcess:
+    """Runs wake word detection in its own process so audio capture and
+    recognition never contend with TTS and command handling for the GIL"""
+    
+    def __init__(self):
+        self._ctx = multiprocessing.get_context("spawn")
+        self.detected = self._ctx.Event()
+        self._stop = self._ctx.Event()
+        self._paused = self._ctx.Event()
+        self._process = None
+        self._bridge = None
+        self._callback = None
+    
+    def start(self):
+        """Start the worker process and the thread that relays its detections"""
+        if self._process is None or not self._process.is_alive():
+            self._stop.clear()
+            self.detected.clear()
+            self._paused.clear()
+            self._process = self._ctx.Process(
+                target=run_wake_word_worker,
+                args=(self.detected, self._stop, self._paused),
+                name="sarah-wake-word",
+                daemon=True
+            )
+            self._process.start()
+        
+        if self._bridge is None or not self._bridge.is_alive():
+            self._bridge = threading.Thread(target=self._relay_detections, daemon=True)
+            self._bridge.start()
+    
+    def _relay_detections(self):
+        """Call the current callback for every detection until stopped"""
+        while True:
+            self.detected.wait()
+            self.detected.clear()
+            if self._stop.is_set():
+                return
+            
+            callback = self._callback
+            if callback:
+                callback()
+    
+    def listen_for_wake_word(self, callback=None):
+        """
+        Deliver the next wake word detections to callback, starting the worker if needed
+        Args:
+            callback: Function to call when wake word is detected
+        """
+        self._callback = callback
+        self.start()
+    
+    def pause(self):
+        """Stop opening the microphone until resume() is called"""
+        self._paused.set()
+    
+    def resume(self):
+        """Go back to listening for wake words after pause()"""
+        self._paused.clear()
+    
+    def stop(self):
+        """Stop the worker process and the relay thread"""
+        self._stop.set()
+        self.detected.set()  # Release the relay thread
+        
+        if self._process is not None:
+            self._process.join(timeout=3)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None